@@ -0,0 +1,12 @@
+"""
+Benchmarks de la API. Se corren desde la raiz del repo, por ejemplo:
+
+    python -m benchmarks.serialization
+"""
+import os
+import sys
+
+# Los modulos de la app se importan como en src/ (from models import db, ...)
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
@@ -0,0 +1,114 @@
+"""
+Compara gunicorn con workers sync (wsgi.py) contra uvicorn (asgi.py) a
+distintos niveles de concurrencia sobre una base SQLite sembrada.
+
+    python -m benchmarks.async_vs_sync --workers 2 --concurrency 1 10 50 200
+
+Con --db se puede apuntar a una base ya cargada (MySQL/Postgres) en lugar
+de la SQLite temporal.
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import benchmarks
+from benchmarks.seed import seed_database
+
+PATHS = ['/planets?limit=50', '/planets/{id}', '/characters?limit=50', '/characters/{id}']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(kind, port, workers, env):
+    if kind == 'gunicorn-sync':
+        cmd = [sys.executable, '-m', 'gunicorn', 'wsgi', '--chdir', benchmarks.SRC,
+               '--workers', str(workers), '--bind', '127.0.0.1:%d' % port, '--log-level', 'warning']
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--app-dir', benchmarks.SRC,
+               '--workers', str(workers), '--port', str(port), '--log-level', 'warning']
+    process = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('%s no arranco' % kind)
+
+async def load(base_url, concurrency, duration, rows, timeout):
+    import httpx
+    latencies = []
+    errors = 0
+    stop = time.perf_counter() + duration
+
+    async def worker(client, n):
+        nonlocal errors
+        i = n
+        while time.perf_counter() < stop:
+            path = PATHS[i % len(PATHS)].format(id=(i * 7919) % rows + 1)
+            i += concurrency
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 500:
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    # Sin keep-alive: los workers sync de gunicorn cierran la conexion igual
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout,
+                                 headers={'Connection': 'close'}) as client:
+        await asyncio.gather(*(worker(client, n) for n in range(concurrency)))
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else float('nan')
+    return len(latencies) / duration, pct(0.50), pct(0.95), pct(0.99), errors
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--db', help='DB_CONNECTION_STRING (por defecto una SQLite temporal)')
+    args = parser.parse_args()
+
+    url = args.db or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    seed_database(url, users=args.rows, planets=args.rows, characters=args.rows, favorites=args.rows * 2)
+    env = dict(os.environ, DB_CONNECTION_STRING=url, LOG_LEVEL='WARNING', CACHE_TTL='0',
+               ADMISSION_ENABLED='false')
+
+    print('%-14s %6s %10s %9s %9s %9s %7s' % ('servidor', 'conc', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'errores'))
+    for kind in ('gunicorn-sync', 'uvicorn-async'):
+        port = free_port()
+        process = start_server(kind, port, args.workers, env)
+        try:
+            # Calentamiento: los workers terminan de importar la app despues de abrir el puerto
+            asyncio.run(load('http://127.0.0.1:%d' % port, args.workers, 2.0, args.rows, args.timeout))
+            for concurrency in args.concurrency:
+                rps, p50, p95, p99, errors = asyncio.run(
+                    load('http://127.0.0.1:%d' % port, concurrency, args.duration, args.rows, args.timeout))
+                print('%-14s %6d %10.0f %9.1f %9.1f %9.1f %7d' % (kind, concurrency, rps, p50, p95, p99, errors))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
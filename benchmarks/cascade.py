@@ -0,0 +1,91 @@
+"""
+Costo de borrar un planeta que tiene N favoritos: con ON DELETE CASCADE
+(lo que hace DELETE /planets/<id>) contra el borrado en cascada del ORM,
+que carga los favoritos y los borra uno por uno. Cuenta las consultas y
+mide el tiempo de cada borrado.
+
+    python -m benchmarks.cascade
+    python -m benchmarks.cascade --favorites 100 1000 10000 100000 --repeat 5
+
+Usa una SQLite temporal; con --db se usa otra base (vacia, se recrea).
+"""
+import os
+import time
+import argparse
+import tempfile
+import statistics
+
+import benchmarks  # noqa: F401  (agrega src/ al path)
+
+
+def seed(db, favorites):
+    # Un planeta (id=1) elegido por `favorites` usuarios
+    from models import User, Planets, Favorites
+    db.session.execute(db.insert(Planets), [{"id": 1, "name": "Planeta 1", "favorites_count": favorites}])
+    db.session.execute(db.insert(User), [
+        {"id": i, "name": "Nombre", "lastname": "Apellido", "username": "usuario%d" % i,
+         "email": "usuario%d@example.com" % i, "password": "x"} for i in range(1, favorites + 1)])
+    db.session.execute(db.insert(Favorites), [
+        {"id_user": i, "id_planets": 1} for i in range(1, favorites + 1)])
+    db.session.commit()
+
+def delete_planet(db, orm_cascade):
+    from models import Planets
+    planet = db.session.get(Planets, 1)
+    if orm_cascade:
+        # Lo que hacia cascade="all, delete-orphan" sin passive_deletes
+        planet.favoritoPlanta[:]
+    db.session.delete(planet)
+    db.session.commit()
+
+def run(app, db, favorites, orm_cascade, repeat):
+    from profiler import record_queries
+    from models import Favorites
+    times = []
+    queries = 0
+    for _ in range(repeat):
+        with app.app_context():
+            db.drop_all(bind_key=None)
+            db.create_all(bind_key=None)
+            seed(db, favorites)
+            db.session.remove()
+            with record_queries() as recorder:
+                start = time.perf_counter()
+                delete_planet(db, orm_cascade)
+                times.append(time.perf_counter() - start)
+            queries = recorder.count
+            assert db.session.query(Favorites).count() == 0
+            db.session.remove()
+    return statistics.median(times), queries
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--favorites', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--db', help='URL de la base (por defecto una SQLite temporal)')
+    args = parser.parse_args()
+
+    path = None
+    if args.db is None:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        args.db = 'sqlite:///' + path
+    os.environ['DB_CONNECTION_STRING'] = args.db
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    from main import create_app
+    from models import db
+    app = create_app({"ADMIN_ENABLED": False, "METRICS_ENABLED": False, "MIGRATE_ENABLED": False})
+
+    print('%10s  %-18s %10s %10s' % ('favoritos', 'borrado', 'consultas', 'ms'))
+    try:
+        for favorites in args.favorites:
+            for label, orm_cascade in (('ON DELETE CASCADE', False), ('cascada del ORM', True)):
+                seconds, queries = run(app, db, favorites, orm_cascade, args.repeat)
+                print('%10d  %-18s %10d %10.1f' % (favorites, label, queries, seconds * 1000))
+    finally:
+        if path is not None:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Costo de CPU contra bytes ahorrados al comprimir las respuestas JSON, por
+codificacion y nivel, para cuerpos de distinto tamanio y para el streaming
+NDJSON (compresion por partes con flush).
+
+    python -m benchmarks.compression
+    python -m benchmarks.compression --rows 50 500 5000 --gzip-levels 1 6 9 --br-qualities 1 4 11
+
+No hace falta base: arma las filas con la misma forma que /user, /planets y
+/characters.
+"""
+import time
+import argparse
+
+import benchmarks  # noqa: F401  (agrega src/ al path)
+from serializers import dumps
+from compression import Compressor, compress, brotli
+
+SHAPES = {
+    'user': lambda i: {"id": i, "name": "Nombre %d" % i, "lastname": "Apellido %d" % i,
+                       "username": "usuario%d" % i, "email": "usuario%d@example.com" % i},
+    'planets': lambda i: {"id": i, "name": "Planeta %d" % i},
+    'characters': lambda i: {"id": i, "name": "Nombre %d" % i, "lastName": "Apellido %d" % i},
+}
+
+
+def timed(fn, min_seconds):
+    # Repite hasta juntar min_seconds y devuelve el tiempo medio por llamada
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        result = fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return result, elapsed / calls
+
+def encodings(gzip_levels, br_qualities):
+    for level in gzip_levels:
+        yield 'gzip', 'gzip-%d' % level, {"level": level}
+    if brotli is not None:
+        for quality in br_qualities:
+            yield 'br', 'br-%d' % quality, {"quality": quality}
+
+def streamed(chunks, encoding, options):
+    compressor = Compressor(encoding, **options)
+    size = 0
+    for chunk in chunks:
+        size += len(compressor.compress(chunk) + compressor.flush())
+    return size + len(compressor.finish())
+
+def report(label, raw, compressed_size, seconds):
+    print('%-22s %-10s %10d %10d %7.1f%% %9.3f %9.1f' % (
+        label[0], label[1], raw, compressed_size, 100.0 * (1 - compressed_size / raw),
+        seconds * 1000, raw / seconds / 1e6))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--stream-rows', type=int, default=50000)
+    parser.add_argument('--stream-batch', type=int, default=1000)
+    parser.add_argument('--gzip-levels', type=int, nargs='+', default=[1, 6, 9])
+    parser.add_argument('--br-qualities', type=int, nargs='+', default=[1, 4, 6, 11])
+    parser.add_argument('--min-seconds', type=float, default=0.2)
+    args = parser.parse_args()
+    if brotli is None:
+        print('brotli no esta instalado: solo gzip\n')
+
+    print('%-22s %-10s %10s %10s %8s %9s %9s' % (
+        'cuerpo', 'codif.', 'bytes', 'comprim.', 'ahorro', 'ms', 'MB/s'))
+    for shape, make_row in SHAPES.items():
+        for rows in args.rows:
+            body = dumps([make_row(i) for i in range(1, rows + 1)])
+            for encoding, label, options in encodings(args.gzip_levels, args.br_qualities):
+                data, seconds = timed(lambda: compress(body, encoding, **options), args.min_seconds)
+                report(('/%s %d filas' % (shape, rows), label), len(body), len(data), seconds)
+        print()
+
+    # Streaming: una parte cada stream_batch filas, con flush despues de cada una
+    lines = [dumps(SHAPES['characters'](i)) + b'\n' for i in range(1, args.stream_rows + 1)]
+    chunks = [b''.join(lines[i:i + args.stream_batch]) for i in range(0, len(lines), args.stream_batch)]
+    raw = sum(len(chunk) for chunk in chunks)
+    for encoding, label, options in encodings(args.gzip_levels, args.br_qualities):
+        size, seconds = timed(lambda: streamed(chunks, encoding, options), args.min_seconds)
+        report(('ndjson %d (stream)' % args.stream_rows, label), raw, size, seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Mide el costo de arranque: corre `python -X importtime` en un proceso nuevo
+que importa main y llama a create_app(), y suma el tiempo propio de cada
+modulo por paquete de primer nivel (flask, sqlalchemy, alembic, ...).
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --set ADMIN_ENABLED=false --set MIGRATE_ENABLED=false
+    python -m benchmarks.importtime --output startup.json
+    python -m benchmarks.importtime --baseline startup.json --threshold 0.2
+
+Cada corrida es un interprete nuevo; de --runs corridas se queda con la mas
+rapida (la que menos ruido del sistema tiene).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from collections import defaultdict
+
+import benchmarks
+
+CHILD = '''
+import sys, json, time
+sys.path.insert(0, %(src)r)
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.create_app(%(config)r)
+created = time.perf_counter()
+print(json.dumps({"import_main_ms": (imported - start) * 1000, "create_app_ms": (created - imported) * 1000}))
+'''
+
+
+def parse_importtime(stderr):
+    # Lineas "import time:  self [us] | cumulative | paquete"; devuelve el
+    # tiempo propio (ms) sumado por paquete de primer nivel
+    packages = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        packages[name.split('.')[0]] += int(parts[0]) / 1000
+    return dict(packages)
+
+def parse_value(text):
+    if text.lower() in ('true', 'false'):
+        return text.lower() == 'true'
+    return text
+
+def run_once(config, env):
+    code = CHILD % {"src": benchmarks.SRC, "config": config}
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                             env=env, capture_output=True, text=True, check=True)
+    timings = json.loads(process.stdout.strip().splitlines()[-1])
+    packages = parse_importtime(process.stderr)
+    timings["imports_ms"] = sum(packages.values())
+    return timings, packages
+
+def compare(current, baseline, threshold):
+    regressions = []
+    for key in ('import_main_ms', 'create_app_ms', 'imports_ms'):
+        if key in baseline and current[key] > baseline[key] * (1 + threshold):
+            regressions.append('%s: %.1fms -> %.1fms' % (key, baseline[key], current[key]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='cuantos paquetes mostrar')
+    parser.add_argument('--set', action='append', default=[], metavar='CLAVE=VALOR',
+                        help='config para create_app (ej: ADMIN_ENABLED=false)')
+    parser.add_argument('--db', help='DB_CONNECTION_STRING (por defecto una SQLite en memoria)')
+    parser.add_argument('--output', help='archivo JSON donde guardar los resultados')
+    parser.add_argument('--baseline', help='JSON de una corrida anterior para comparar')
+    parser.add_argument('--threshold', type=float, default=0.20)
+    args = parser.parse_args()
+
+    config = {}
+    for item in args.set:
+        key, _, value = item.partition('=')
+        config[key] = parse_value(value)
+    env = dict(os.environ, DB_CONNECTION_STRING=args.db or 'sqlite://', LOG_LEVEL='WARNING')
+
+    best = None
+    for _ in range(args.runs):
+        timings, packages = run_once(config, env)
+        if best is None or timings["import_main_ms"] + timings["create_app_ms"] < \
+                best[0]["import_main_ms"] + best[0]["create_app_ms"]:
+            best = (timings, packages)
+    timings, packages = best
+
+    print('import main   %8.1f ms' % timings["import_main_ms"])
+    print('create_app()  %8.1f ms' % timings["create_app_ms"])
+    print('imports total %8.1f ms\n' % timings["imports_ms"])
+    print('%-24s %10s' % ('paquete', 'ms'))
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print('%-24s %10.1f' % (name, ms))
+
+    report = {
+        "meta": {
+            "config": config,
+            "runs": args.runs,
+            "python": platform.python_version(),
+            "timestamp": int(time.time()),
+        },
+        "results": dict(timings, packages={k: round(v, 2) for k, v in packages.items()}),
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(timings, baseline, args.threshold)
+        if regressions:
+            print('\nRegresiones por encima de %d%%:' % (args.threshold * 100))
+            for line in regressions:
+                print('  ' + line)
+            sys.exit(1)
+        print('\nSin regresiones por encima de %d%%' % (args.threshold * 100))
+
+
+if __name__ == '__main__':
+    main()
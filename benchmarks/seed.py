@@ -0,0 +1,96 @@
+"""
+Siembra una base con User, Planets, Characters y Favorites para los benchmarks.
+
+    python -m benchmarks.seed --db sqlite:////tmp/bench.db --size 100k
+"""
+import os
+import time
+import argparse
+
+import benchmarks  # noqa: F401  (agrega src/ al path)
+
+# Filas por tabla para cada tamanio; Favorites tiene el doble que User
+SIZES = {
+    '1k': 1000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+BATCH = 10000
+
+
+def counts_for(size):
+    rows = SIZES[size]
+    return {"users": rows, "planets": rows, "characters": rows, "favorites": rows * 2}
+
+def make_app(url):
+    from flask import Flask
+    from models import db
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+def insert_batches(table, rows):
+    from models import db
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+def favorite_rows(count, users, planets, characters):
+    # Mitad planetas y mitad personajes, sin repetir (usuario, planeta) ni
+    # (usuario, personaje) para respetar los indices unicos
+    for i in range(count):
+        k = i // 2
+        user = k % users + 1
+        if i % 2 == 0:
+            yield {"id_user": user, "id_planets": (k + k // users) % planets + 1, "id_characters": None}
+        else:
+            yield {"id_user": user, "id_planets": None, "id_characters": (k + k // users) % characters + 1}
+
+def seed_database(url, users, planets, characters, favorites):
+    # Crea las tablas (si no existen) y las llena; devuelve cuantas filas hay
+    from models import db, User, Planets, Characters, Favorites
+    import search  # noqa: F401  (create_all crea tambien los indices de busqueda)
+    app = make_app(url)
+    with app.app_context():
+        db.create_all()
+        if db.session.query(User.id).first() is None:
+            insert_batches(User.__table__, (
+                {"name": "Nombre %d" % i, "lastname": "Apellido %d" % i, "username": "usuario%d" % i,
+                 "email": "usuario%d@example.com" % i, "password": "secreto"} for i in range(users)))
+            insert_batches(Planets.__table__, ({"name": "Planeta %d" % i} for i in range(planets)))
+            insert_batches(Characters.__table__, (
+                {"name": "Nombre %d" % i, "lastName": "Apellido %d" % i} for i in range(characters)))
+            insert_batches(Favorites.__table__, favorite_rows(favorites, users, planets, characters))
+            db.session.commit()
+            # Los inserts de Core no pasan por los contadores de favoritos
+            from popularity import reconcile
+            reconcile()
+        return {
+            "users": db.session.query(db.func.count(User.id)).scalar(),
+            "planets": db.session.query(db.func.count(Planets.id)).scalar(),
+            "characters": db.session.query(db.func.count(Characters.id)).scalar(),
+            "favorites": db.session.query(db.func.count(Favorites.id)).scalar(),
+        }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', default=os.environ.get('DB_CONNECTION_STRING'), required=False)
+    parser.add_argument('--size', choices=sorted(SIZES), default='1k')
+    args = parser.parse_args()
+    if not args.db:
+        parser.error('falta --db o DB_CONNECTION_STRING')
+
+    start = time.perf_counter()
+    counts = seed_database(args.db, **counts_for(args.size))
+    print('%s en %.1fs' % (counts, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compara filas/segundo de serialize() sobre objetos del ORM contra la
+proyeccion de columnas de serializers.py, sobre una base SQLite temporal.
+
+    python -m benchmarks.serialization --rows 100000
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+
+import benchmarks  # noqa: F401  (agrega src/ al path)
+from benchmarks.seed import make_app, seed_database
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    seed_database(url, users=args.rows, planets=args.rows, characters=0, favorites=0)
+    from models import db, User, Planets
+    import serializers
+
+    app = make_app(url)
+    with app.app_context():
+        for model in (Planets, User):
+            def orm():
+                db.session.expunge_all()
+                json.dumps([row.serialize() for row in model.query.order_by(model.id)])
+
+            def projection():
+                names = model.serialize_columns
+                serializers.dumps(serializers.to_dicts(names, serializers.project(model).order_by(model.id)))
+
+            orm_time = timed(orm, args.repeat)
+            projection_time = timed(projection, args.repeat)
+            print('%-8s serialize(): %10.0f filas/s   proyeccion%s: %10.0f filas/s   (x%.1f)' % (
+                model.__tablename__, args.rows / orm_time,
+                ' + orjson' if serializers.orjson else '', args.rows / projection_time,
+                orm_time / projection_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Corre cada endpoint contra una base sembrada y mide throughput, latencias
+(p50/p95/p99) y RSS maximo. Guarda los resultados en JSON y, con
+--baseline, falla si algo empeora mas que --threshold.
+
+    python -m benchmarks.suite --size 1k --output bench_1k.json
+    python -m benchmarks.suite --size 1k --baseline bench_1k.json --threshold 0.15
+
+Por defecto usa el test client de Flask sobre una SQLite temporal; con
+--db se usa otra base (MySQL/Postgres) y con --url un servidor ya levantado.
+"""
+import os
+import sys
+import json
+import time
+import random
+import resource
+import argparse
+import platform
+import tempfile
+import http.client
+from urllib.parse import urlsplit
+
+import benchmarks  # noqa: F401  (agrega src/ al path)
+from benchmarks.seed import SIZES, counts_for, seed_database
+
+
+def scenarios(counts):
+    # (nombre, metodo, funcion que arma la ruta a partir de un Random)
+    users, planets, characters, favorites = (
+        counts["users"], counts["planets"], counts["characters"], counts["favorites"])
+    from pagination import encode_cursor
+    deep = lambda n: encode_cursor([max(n - 60, 0)])
+    return [
+        ('GET /user', 'GET', lambda r: '/user?limit=50'),
+        ('GET /user deep page', 'GET', lambda r: '/user?limit=50&after=' + deep(users)),
+        ('GET /user/<id>', 'GET', lambda r: '/user/%d' % r.randint(1, users)),
+        ('GET /user/<id>/favorites', 'GET', lambda r: '/user/%d/favorites' % r.randint(1, users)),
+        ('GET /planets', 'GET', lambda r: '/planets?limit=50'),
+        ('GET /planets deep page', 'GET', lambda r: '/planets?limit=50&after=' + deep(planets)),
+        ('GET /planets/<id>', 'GET', lambda r: '/planets/%d' % r.randint(1, planets)),
+        ('GET /planets/top', 'GET', lambda r: '/planets/top?n=10'),
+        ('GET /characters', 'GET', lambda r: '/characters?limit=50'),
+        ('GET /characters deep page', 'GET', lambda r: '/characters?limit=50&after=' + deep(characters)),
+        ('GET /characters/<id>', 'GET', lambda r: '/characters/%d' % r.randint(1, characters)),
+        ('GET /favorits', 'GET', lambda r: '/favorits?limit=50'),
+        ('GET /favorits deep page', 'GET', lambda r: '/favorits?limit=50&after=' + deep(favorites)),
+        ('GET /favorits/<id>', 'GET', lambda r: '/favorits/%d' % r.randint(1, favorites)),
+        ('GET /search prefix', 'GET', lambda r: '/search?q=planeta%%20%d' % r.randint(1, planets)),
+        ('GET /search substring', 'GET', lambda r: '/search?q=eta%%20%d' % r.randint(1, planets)),
+        ('POST /favorite/planet', 'POST',
+         lambda r: '/favorite/planet/%d/%d' % (r.randint(1, users), r.randint(1, planets))),
+        ('DELETE /favorite/planet', 'DELETE',
+         lambda r: '/favorite/planet/%d/%d' % (r.randint(1, users), r.randint(1, planets))),
+    ]
+
+
+class TestClientDriver:
+    def __init__(self):
+        from main import create_app
+        self.client = create_app({"ADMIN_ENABLED": False, "MIGRATE_ENABLED": False, "ADMISSION_ENABLED": False}).test_client()
+
+    def request(self, method, path):
+        response = self.client.open(path, method=method)
+        response.get_data()
+        return response.status_code
+
+
+class HTTPDriver:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+
+    def request(self, method, path):
+        self.connection.request(method, path)
+        response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+
+def peak_rss_mb():
+    # ru_maxrss esta en KB en Linux y en bytes en macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+def measure(driver, method, path_for, requests, warmup, rng):
+    for _ in range(warmup):
+        driver.request(method, path_for(rng))
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        path = path_for(rng)
+        t0 = time.perf_counter()
+        status = driver.request(method, path)
+        latencies.append(time.perf_counter() - t0)
+        if status >= 500:
+            errors += 1
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+def compare(results, baseline, threshold):
+    # Devuelve la lista de regresiones: menos req/s o mas p95 que el umbral
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current["rps"] < previous["rps"] * (1 - threshold):
+            regressions.append('%s: req/s %.1f -> %.1f' % (name, previous["rps"], current["rps"]))
+        if current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append('%s: p95 %.3fms -> %.3fms' % (name, previous["p95_ms"], current["p95_ms"]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', choices=sorted(SIZES), default='1k')
+    parser.add_argument('--db', help='DB_CONNECTION_STRING (por defecto una SQLite temporal)')
+    parser.add_argument('--url', help='servidor ya levantado en lugar del test client')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--only', nargs='*', help='correr solo estos escenarios (prefijo del nombre)')
+    parser.add_argument('--no-cache', action='store_true', help='CACHE_TTL=0')
+    parser.add_argument('--output', help='archivo JSON donde guardar los resultados')
+    parser.add_argument('--baseline', help='JSON de una corrida anterior para comparar')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    url = args.db or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_%s.db' % args.size)
+    os.environ['DB_CONNECTION_STRING'] = url
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    if args.no_cache:
+        os.environ['CACHE_TTL'] = '0'
+
+    start = time.perf_counter()
+    counts = seed_database(url, **counts_for(args.size))
+    print('base sembrada %s en %.1fs' % (counts, time.perf_counter() - start))
+
+    driver = HTTPDriver(args.url) if args.url else TestClientDriver()
+    results = {}
+    print('%-30s %9s %9s %9s %9s %8s %7s' % ('escenario', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'RSS MB', 'errores'))
+    for name, method, path_for in scenarios(counts):
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        rng = random.Random(args.seed)
+        result = measure(driver, method, path_for, args.requests, args.warmup, rng)
+        results[name] = result
+        print('%-30s %9.1f %9.3f %9.3f %9.3f %8.1f %7d' % (
+            name, result["rps"], result["p50_ms"], result["p95_ms"], result["p99_ms"],
+            result["peak_rss_mb"], result["errors"]))
+
+    report = {
+        "meta": {
+            "size": args.size,
+            "counts": counts,
+            "dialect": url.split(':', 1)[0],
+            "driver": 'http' if args.url else 'test_client',
+            "requests": args.requests,
+            "python": platform.python_version(),
+            "timestamp": int(time.time()),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print('\nRegresiones por encima de %d%%:' % (args.threshold * 100))
+            for line in regressions:
+                print('  ' + line)
+            sys.exit(1)
+        print('\nSin regresiones por encima de %d%%' % (args.threshold * 100))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+# Configuracion de gunicorn (la toma el Procfile)
+import os
+import shutil
+import tempfile
+
+# Directorio compartido para que /metrics sume los valores de todos los workers.
+# Tiene que existir antes de que los workers importen prometheus_client.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'prometheus_multiproc'))
+
+# Workers con threads: cada proceso atiende varios pedidos a la vez y los
+# limites de concurrencia por clase de costo (admission.py) tienen efecto.
+# Con workers sync cada proceso atiende uno solo y nunca se llegan a usar.
+# La cantidad de procesos la toma gunicorn de WEB_CONCURRENCY (Heroku la fija).
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+
+def on_starting(server):
+    # Arranca con el directorio vacio para no mezclar valores de otra ejecucion
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
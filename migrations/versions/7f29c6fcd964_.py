@@ -0,0 +1,34 @@
+"""table_version para los ETag
+
+Revision ID: 7f29c6fcd964
+Revises: 19d9d14bfdb7
+Create Date: 2026-10-18 10:12:31.402115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f29c6fcd964'
+down_revision = '19d9d14bfdb7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table_version = op.create_table('table_version',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(table_version, [
+        {'name': 'user', 'version': 1},
+        {'name': 'planets', 'version': 1},
+        {'name': 'characters', 'version': 1},
+        {'name': 'favorites', 'version': 1},
+    ])
+
+
+def downgrade():
+    op.drop_table('table_version')
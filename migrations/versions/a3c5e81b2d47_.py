@@ -0,0 +1,39 @@
+"""indices unicos en favorites
+
+Revision ID: a3c5e81b2d47
+Revises: 7f29c6fcd964
+Create Date: 2026-10-18 11:40:08.517204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e81b2d47'
+down_revision = '7f29c6fcd964'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Antes de crear los indices unicos se quitan los repetidos. Una fila puede
+    # tener planeta y personaje: en las repetidas solo se anula la columna
+    # repetida, y se borran las filas que quedan sin ninguna de las dos
+    # (la subconsulta derivada es necesaria en MySQL).
+    op.execute(
+        "UPDATE favorites SET id_planets = NULL WHERE id_planets IS NOT NULL AND id NOT IN "
+        "(SELECT id FROM (SELECT MIN(id) AS id FROM favorites "
+        "WHERE id_planets IS NOT NULL GROUP BY id_user, id_planets) AS keep_rows)")
+    op.execute(
+        "UPDATE favorites SET id_characters = NULL WHERE id_characters IS NOT NULL AND id NOT IN "
+        "(SELECT id FROM (SELECT MIN(id) AS id FROM favorites "
+        "WHERE id_characters IS NOT NULL GROUP BY id_user, id_characters) AS keep_rows)")
+    op.execute("DELETE FROM favorites WHERE id_planets IS NULL AND id_characters IS NULL")
+    op.create_index('ix_favorites_user_planets', 'favorites', ['id_user', 'id_planets'], unique=True)
+    op.create_index('ix_favorites_user_characters', 'favorites', ['id_user', 'id_characters'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_favorites_user_characters', table_name='favorites')
+    op.drop_index('ix_favorites_user_planets', table_name='favorites')
@@ -0,0 +1,89 @@
+"""indices de busqueda por nombre en planets y characters
+
+Revision ID: c81d2f4a9e63
+Revises: a3c5e81b2d47
+Create Date: 2026-10-18 15:02:41.306118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81d2f4a9e63'
+down_revision = 'a3c5e81b2d47'
+branch_labels = None
+depends_on = None
+
+
+def fts5(source, fts, cols):
+    # Tabla FTS5 de contenido externo con trigram, sincronizada por triggers.
+    # El de UPDATE solo mira las columnas indexadas: los contadores de
+    # favoritos no reescriben los trigramas.
+    names = ', '.join('"%s"' % c for c in cols)
+    new = ', '.join('new."%s"' % c for c in cols)
+    old = ', '.join('old."%s"' % c for c in cols)
+    statements = [
+        "CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{source}', "
+        "content_rowid='id', tokenize='trigram')",
+        "CREATE TRIGGER {fts}_ai AFTER INSERT ON {source} BEGIN "
+        "INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+        "CREATE TRIGGER {fts}_ad AFTER DELETE ON {source} BEGIN "
+        "INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); END",
+        "CREATE TRIGGER {fts}_au AFTER UPDATE OF {names} ON {source} BEGIN "
+        "INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+        "INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+        # Indexa las filas que ya existen
+        "INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+    return [s.format(fts=fts, source=source, names=names, new=new, old=old) for s in statements]
+
+
+def upgrade():
+    # B-tree comunes: chequeos de nombre repetido en las altas y prefijos en MySQL
+    op.create_index('ix_planets_name', 'planets', ['name'])
+    op.create_index('ix_characters_name', 'characters', ['name'])
+    op.create_index('ix_characters_lastName', 'characters', ['lastName'])
+
+    dialect = op.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        op.execute('CREATE INDEX ix_planets_name_lower ON planets (lower(name))')
+        op.execute('CREATE INDEX ix_characters_name_lower ON characters (lower(name))')
+        op.execute('CREATE INDEX ix_characters_lastname_lower ON characters (lower("lastName"))')
+    if dialect == 'sqlite':
+        for statement in fts5('planets', 'planets_fts', ['name']) \
+                + fts5('characters', 'characters_fts', ['name', 'lastName']):
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute('CREATE INDEX ix_planets_name_trgm ON planets USING gin (lower(name) gin_trgm_ops)')
+        op.execute('CREATE INDEX ix_characters_name_trgm ON characters USING gin (lower(name) gin_trgm_ops)')
+        op.execute('CREATE INDEX ix_characters_lastname_trgm ON characters '
+                   'USING gin (lower("lastName") gin_trgm_ops)')
+    elif dialect == 'mysql':
+        op.execute('CREATE FULLTEXT INDEX ix_planets_name_ft ON planets (name) WITH PARSER ngram')
+        op.execute('CREATE FULLTEXT INDEX ix_characters_name_ft ON characters (name, lastName) WITH PARSER ngram')
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for fts in ('planets_fts', 'characters_fts'):
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute('DROP TRIGGER IF EXISTS %s_%s' % (fts, suffix))
+            op.execute('DROP TABLE IF EXISTS %s' % fts)
+    elif dialect == 'postgresql':
+        op.drop_index('ix_characters_lastname_trgm', table_name='characters')
+        op.drop_index('ix_characters_name_trgm', table_name='characters')
+        op.drop_index('ix_planets_name_trgm', table_name='planets')
+    elif dialect == 'mysql':
+        op.drop_index('ix_characters_name_ft', table_name='characters')
+        op.drop_index('ix_planets_name_ft', table_name='planets')
+    if dialect in ('sqlite', 'postgresql'):
+        op.drop_index('ix_characters_lastname_lower', table_name='characters')
+        op.drop_index('ix_characters_name_lower', table_name='characters')
+        op.drop_index('ix_planets_name_lower', table_name='planets')
+
+    op.drop_index('ix_characters_lastName', table_name='characters')
+    op.drop_index('ix_characters_name', table_name='characters')
+    op.drop_index('ix_planets_name', table_name='planets')
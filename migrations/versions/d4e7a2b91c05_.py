@@ -0,0 +1,47 @@
+"""contador de favoritos en planets y characters
+
+Revision ID: d4e7a2b91c05
+Revises: c81d2f4a9e63
+Create Date: 2026-10-18 17:26:12.840552
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e7a2b91c05'
+down_revision = 'c81d2f4a9e63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('planets', sa.Column('favorites_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('characters', sa.Column('favorites_count', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index('ix_favorites_planets', 'favorites', ['id_planets'])
+    op.create_index('ix_favorites_characters', 'favorites', ['id_characters'])
+
+    # Carga inicial de los contadores
+    op.execute(
+        "UPDATE planets SET favorites_count = "
+        "(SELECT COUNT(*) FROM favorites WHERE favorites.id_planets = planets.id)")
+    op.execute(
+        "UPDATE characters SET favorites_count = "
+        "(SELECT COUNT(*) FROM favorites WHERE favorites.id_characters = characters.id)")
+
+    op.create_index('ix_planets_favorites_count', 'planets', ['favorites_count', 'id'])
+    op.create_index('ix_characters_favorites_count', 'characters', ['favorites_count', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_characters_favorites_count', table_name='characters')
+    op.drop_index('ix_planets_favorites_count', table_name='planets')
+    op.drop_index('ix_favorites_characters', table_name='favorites')
+    op.drop_index('ix_favorites_planets', table_name='favorites')
+    # Sin batch_alter_table: en SQLite reconstruia las tablas y se perdian los
+    # indices por expresion y los triggers FTS5 de la busqueda (y, con las FK
+    # activas, los favoritos por el ON DELETE CASCADE). SQLite borra columnas
+    # con ALTER TABLE desde la 3.35.
+    op.drop_column('characters', 'favorites_count')
+    op.drop_column('planets', 'favorites_count')
@@ -0,0 +1,41 @@
+"""favoritos con ON DELETE CASCADE
+
+Revision ID: e6b3f0c9d217
+Revises: d4e7a2b91c05
+Create Date: 2026-10-18 19:02:47.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b3f0c9d217'
+down_revision = 'd4e7a2b91c05'
+branch_labels = None
+depends_on = None
+
+# Las FK de favorites se crearon sin nombre: se leen de la base y, en SQLite
+# (donde no tienen nombre), batch_alter_table las identifica con esta convencion
+NAMING = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+REFERENCES = (('id_user', 'user'), ('id_planets', 'planets'), ('id_characters', 'characters'))
+
+
+def _replace_foreign_keys(ondelete):
+    existing = {}
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys('favorites'):
+        existing[fk['constrained_columns'][0]] = fk['name']
+    with op.batch_alter_table('favorites', naming_convention=NAMING) as batch_op:
+        for column, table in REFERENCES:
+            name = 'fk_favorites_%s_%s' % (column, table)
+            if column in existing:
+                batch_op.drop_constraint(existing[column] or name, type_='foreignkey')
+            batch_op.create_foreign_key(name, table, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    _replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _replace_foreign_keys(None)
@@ -0,0 +1,217 @@
+import os
+import math
+import time
+import threading
+from collections import OrderedDict
+from flask import request, g, current_app
+from serializers import json_response
+from streaming import wants_stream
+
+# Control de admision: cuando la base se pone lenta, rechazar rapido (429 o
+# 503 con Retry-After) es mejor que dejar que los pedidos se acumulen en
+# los workers hasta que vencen en el cliente. Cada ruta tiene una clase de
+# costo y cada clase:
+#  - un limite de pedidos simultaneos por proceso
+#  - una espera maxima en cola: la del router (cabecera X-Request-Start) mas
+#    la espera por un lugar dentro del limite
+#  - un costo en tokens del bucket de cada cliente (429 si no alcanza)
+# Las clases caras tienen menos lugares y menos paciencia, asi que cuando
+# hay cola se descartan primero los listados y exportaciones y se siguen
+# sirviendo las lecturas por id (que casi siempre salen de la cache).
+
+# Tokens por segundo y tamanio del bucket de cada cliente. Apagado por
+# defecto (0): detras de un router (Heroku) REMOTE_ADDR es el del router y
+# todos los clientes compartirian un bucket; se prende junto con TRUSTED_PROXIES
+RATE_LIMIT = float(os.environ.get('RATE_LIMIT', 0))
+RATE_BURST = float(os.environ.get('RATE_BURST', 40))
+# Cuantos proxies propios hay delante (el cliente se toma de X-Forwarded-For)
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+MAX_CLIENTS = 10000
+MAX_QUEUE_DELAY = 3600
+# Endpoints que no pasan por el control (monitoreo)
+EXEMPT = ('metrics', 'static')
+
+
+def _class_setting(name, setting, default):
+    return float(os.environ.get('ADMISSION_%s_%s' % (name.upper(), setting), default))
+
+def _cost_class(name, limit, queue_ms, tokens):
+    # limit 0: sin limite de concurrencia
+    return {"limit": int(_class_setting(name, 'LIMIT', limit)),
+            "queue": _class_setting(name, 'QUEUE_MS', queue_ms) / 1000.0,
+            "tokens": _class_setting(name, 'TOKENS', tokens)}
+
+COST_CLASSES = {
+    'cheap': _cost_class('cheap', 0, 2000, 1),
+    'write': _cost_class('write', 8, 1000, 1),
+    'list': _cost_class('list', 4, 500, 2),
+    'heavy': _cost_class('heavy', 1, 250, 10),
+}
+
+
+def cost(name):
+    # Marca la clase de costo de una vista; sin marca, los GET son 'cheap'
+    # y el resto 'write'. Va justo debajo de @api.route.
+    if name not in COST_CLASSES:
+        raise ValueError('Clase de costo desconocida: %s' % name)
+    def decorator(view):
+        view.admission_cost = name
+        return view
+    return decorator
+
+def request_cost():
+    view = current_app.view_functions.get(request.endpoint)
+    name = getattr(view, 'admission_cost', None)
+    if name is None:
+        name = 'cheap' if request.method in ('GET', 'HEAD', 'OPTIONS') else 'write'
+    if name == 'list' and wants_stream():
+        # La tabla entera en streaming cuesta como una exportacion
+        return 'heavy'
+    return name
+
+
+def queue_delay(environ, now=None):
+    # X-Request-Start la ponen el router o nginx: "t=1700000000.123" en
+    # segundos, o milisegundos/microsegundos desde epoch (Heroku usa ms)
+    value = environ.get('HTTP_X_REQUEST_START', '').strip()
+    if value.startswith('t='):
+        value = value[2:]
+    try:
+        start = float(value)
+    except ValueError:
+        return 0.0
+    if start > 1e14:
+        start /= 1e6
+    elif start > 1e11:
+        start /= 1e3
+    delay = (now or time.time()) - start
+    # Un valor absurdo (cabecera rota, reloj del router desfasado) no cuenta
+    if not 0 < delay < MAX_QUEUE_DELAY:
+        return 0.0
+    return delay
+
+def client_key(environ):
+    if TRUSTED_PROXIES:
+        hops = [hop.strip() for hop in environ.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+        if len(hops) >= TRUSTED_PROXIES:
+            return hops[-TRUSTED_PROXIES]
+    return environ.get('REMOTE_ADDR', '')
+
+
+class TokenBuckets:
+    # Un bucket por cliente, con los menos usados descartados pasado MAX_CLIENTS
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST, max_clients=MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, tokens, now=None):
+        # 0 si se admitio, o los segundos que faltan para tener los tokens
+        if self.rate <= 0:
+            return 0
+        now = now or time.monotonic()
+        tokens = min(tokens, self.burst)
+        with self._lock:
+            level, updated = self._buckets.pop(key, (self.burst, now))
+            level = min(self.burst, level + (now - updated) * self.rate)
+            wait = 0
+            if level >= tokens:
+                level -= tokens
+            else:
+                wait = (tokens - level) / self.rate
+            self._buckets[key] = (level, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class Admission:
+    def __init__(self, classes=COST_CLASSES, buckets=None):
+        self.classes = classes
+        self.buckets = buckets or TokenBuckets()
+        self.slots = {name: threading.BoundedSemaphore(settings["limit"])
+                      for name, settings in classes.items() if settings["limit"] > 0}
+        self.counts = {name: {"admitted": 0, "rate_limited": 0, "queue": 0, "busy": 0} for name in classes}
+        self.in_use = {name: 0 for name in classes}
+        # Los workers gthread atienden varios pedidos a la vez en el proceso
+        self._lock = threading.Lock()
+
+    def _count(self, name, result):
+        with self._lock:
+            self.counts[name][result] += 1
+            if result == "admitted":
+                self.in_use[name] += 1
+
+    def admit(self, name, environ):
+        # None si el pedido pasa (y queda ocupando su lugar), o la respuesta de rechazo
+        settings = self.classes[name]
+        waited = queue_delay(environ)
+        if waited > settings["queue"]:
+            self._count(name, "queue")
+            return reject(503, 'Servidor ocupado, reintente en unos segundos', 1)
+
+        wait = self.buckets.take(client_key(environ), settings["tokens"])
+        if wait:
+            self._count(name, "rate_limited")
+            return reject(429, 'Demasiados pedidos', wait)
+
+        slots = self.slots.get(name)
+        if slots is not None and not slots.acquire(timeout=settings["queue"] - waited):
+            self._count(name, "busy")
+            return reject(503, 'Servidor ocupado, reintente en unos segundos', 1)
+        self._count(name, "admitted")
+        return None
+
+    def release(self, name):
+        with self._lock:
+            self.in_use[name] -= 1
+        slots = self.slots.get(name)
+        if slots is not None:
+            slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(counts, limit=self.classes[name]["limit"], in_use=self.in_use[name])
+                    for name, counts in self.counts.items()}
+
+def reject(status, message, retry_after):
+    response = json_response({"message": message}, status=status)
+    response.headers['Retry-After'] = str(max(int(math.ceil(retry_after)), 1))
+    return response
+
+
+def _before_request():
+    if request.endpoint in EXEMPT:
+        return None
+    admission = current_app.extensions['admission']
+    name = request_cost()
+    rejection = admission.admit(name, request.environ)
+    if rejection is None:
+        g.admission_cost = name
+    return rejection
+
+def _after_request(response):
+    # El lugar se libera cuando el servidor cierra la respuesta: en las que
+    # van en streaming eso es al terminar de mandar el cuerpo, no al salir
+    # de la vista
+    name = g.pop('admission_cost', None)
+    if name is not None:
+        admission = current_app.extensions['admission']
+        response.call_on_close(lambda: admission.release(name))
+    return response
+
+def _teardown_request(error):
+    # La vista fallo sin respuesta: _after_request no llego a correr
+    name = g.pop('admission_cost', None)
+    if name is not None:
+        current_app.extensions['admission'].release(name)
+
+def setup_admission(app):
+    if not app.config.get('ADMISSION_ENABLED', True):
+        return
+    app.extensions['admission'] = Admission()
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
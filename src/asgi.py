@@ -0,0 +1,151 @@
+"""
+Punto de entrada ASGI alternativo: los GET de lectura (/user, /planets,
+/characters, /favorits y sus /<id>) se sirven con un engine async de
+SQLAlchemy; todo lo demas (escrituras, streaming, admin) pasa a la app
+Flask de siempre.
+
+    uvicorn asgi:application --app-dir src --workers 4
+"""
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route, Mount
+from a2wsgi import WSGIMiddleware
+from main import create_app
+from models import User, Planets, Characters, Favorites, TableVersion
+from pagination import list_page_args, keyset_select, finish_page, next_link
+from pool import engine_options
+from serializers import columns, dumps
+from sql_compat import async_url
+from compression import negotiate, compress, COMPRESS_ENABLED, COMPRESS_MIN_SIZE
+from utils import APIException
+from versions import format_etag, entity_etag, representation
+
+
+def async_engine_options(url):
+    options = engine_options(url)
+    # El pool async lo elige SQLAlchemy (AsyncAdaptedQueuePool)
+    options.pop('poolclass', None)
+    # El timeout ya sale de engine_options segun el driver (asyncpg, aiomysql)
+    return options
+
+def accepted_encoding(request):
+    return negotiate(request.headers.get('accept-encoding')) if COMPRESS_ENABLED else None
+
+def json_response(obj, status=200, headers=None, encoding=None):
+    # Misma regla que CompressionMiddleware: solo cuerpos de COMPRESS_MIN_SIZE o mas
+    body = dumps(obj)
+    headers = dict(headers or {}, Vary='Accept-Encoding')
+    if encoding is not None and len(body) >= COMPRESS_MIN_SIZE:
+        body = compress(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(body, status_code=status, headers=headers, media_type='application/json')
+
+def request_variant(request):
+    return representation(request.url.path, request.url.query, request.headers.get('accept', ''),
+                          request.headers.get('accept-encoding'))
+
+async def conditional_etag(conn, request, tables):
+    rows = await conn.execute(
+        select(TableVersion.name, TableVersion.version).where(TableVersion.name.in_(tables)))
+    versions = dict(rows.all())
+    return format_etag(tables, [versions.get(table, 0) for table in tables], request_variant(request))
+
+def not_modified(request, etag):
+    tags = [tag.strip().strip('"') for tag in request.headers.get('if-none-match', '').split(',')]
+    return etag in tags or '*' in tags
+
+
+def list_view(engine, model, table):
+    async def view(request):
+        limit, after, listing = list_page_args(model, request.query_params)
+        async with engine.connect() as conn:
+            etag = await conditional_etag(conn, request, (table,))
+            if not_modified(request, etag):
+                return Response(status_code=304, headers={'ETag': '"%s"' % etag})
+            rows = (await conn.execute(keyset_select(model, limit, after, listing))).all()
+
+        results, next_cursor = finish_page(model, rows, limit, listing)
+        headers = {'ETag': '"%s"' % etag}
+        if next_cursor is not None:
+            base_url = str(request.url.replace(query=''))
+            headers['X-Next-Cursor'] = next_cursor
+            headers['Link'] = next_link(base_url, request.query_params.multi_items(), next_cursor)
+        return json_response(results, headers=headers, encoding=accepted_encoding(request))
+    return view
+
+def entity_view(engine, model, table, message):
+    # Como en Flask, el ETag de una fila sale de sus datos
+    async def view(request):
+        entity_id = request.path_params['id']
+        async with engine.connect() as conn:
+            row = (await conn.execute(select(*columns(model)).where(model.id == entity_id))).first()
+
+        if row is None:
+            raise APIException(message, status_code=404)
+        entity = dict(zip(model.serialize_columns, row))
+        etag = entity_etag(table, entity, request_variant(request))
+        if not_modified(request, etag):
+            return Response(status_code=304, headers={'ETag': '"%s"' % etag})
+        return json_response(entity, headers={'ETag': '"%s"' % etag}, encoding=accepted_encoding(request))
+    return view
+
+async def handle_api_exception(request, error):
+    return json_response(error.to_dict(), status=error.status_code)
+
+def wants_stream(scope):
+    # Igual que streaming.wants_stream pero mirando el scope ASGI
+    query = parse_qs(scope.get('query_string', b'').decode())
+    if query.get('stream', [''])[-1] in ('1', 'true'):
+        return True
+    accept = dict(scope.get('headers', [])).get(b'accept', b'')
+    return b'application/x-ndjson' in accept and b'application/json' not in accept
+
+
+READ_ROUTES = [
+    ('/user', '/user/{id:int}', User, 'user', 'No existe el usuario'),
+    ('/planets', '/planets/{id:int}', Planets, 'planets', 'No existe el planeta'),
+    ('/characters', '/characters/{id:int}', Characters, 'characters', 'No existe el personaje'),
+    ('/favorits', '/favorits/{id:int}', Favorites, 'favorites', 'No existe el favorito'),
+]
+
+def create_asgi_app(config=None):
+    # config se pasa a create_app; el engine async usa la misma base que la
+    # app Flask salvo que se indique ASYNC_DB_CONNECTION_STRING
+    flask_app = create_app(dict({"MIGRATE_ENABLED": False}, **(config or {})))
+    url = os.environ.get('ASYNC_DB_CONNECTION_STRING') or async_url(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+    engine = create_async_engine(url, **async_engine_options(url))
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await engine.dispose()
+
+    routes = []
+    for list_path, entity_path, model, table, message in READ_ROUTES:
+        routes.append(Route(list_path, list_view(engine, model, table), methods=['GET']))
+        routes.append(Route(entity_path, entity_view(engine, model, table, message), methods=['GET']))
+    # Lo que no matchea arriba (otros metodos, otras rutas) lo atiende Flask
+    flask_asgi = WSGIMiddleware(flask_app)
+    routes.append(Mount('/', flask_asgi))
+
+    reads = Starlette(
+        routes=routes,
+        exception_handlers={APIException: handle_api_exception},
+        lifespan=lifespan)
+
+    async def application(scope, receive, send):
+        # El streaming de tablas completas (NDJSON) lo sigue haciendo Flask
+        if scope['type'] == 'http' and wants_stream(scope):
+            await flask_asgi(scope, receive, send)
+        else:
+            await reads(scope, receive, send)
+    application.flask_app = flask_app
+    application.engine = engine
+    return application
+
+application = create_asgi_app()
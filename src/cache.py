@@ -0,0 +1,161 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from sqlalchemy import event
+from models import db
+from versions import bump_version, clear_bumped, commit_bumped, publish_versions, table_version
+from replicas import cache_scope
+
+MISSING = object()
+
+
+class LRUCache:
+    # Cache en memoria del proceso: LRU con expiracion por TTL
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key, MISSING)
+            if item is MISSING:
+                self.misses += 1
+                return MISSING
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class NullCache:
+    # Backend que no guarda nada (CACHE_TTL=0)
+    hits = misses = evictions = 0
+
+    def get(self, key):
+        self.misses += 1
+        return MISSING
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"size": 0, "maxsize": 0, "hits": 0, "misses": self.misses, "evictions": 0}
+
+
+def default_backend():
+    ttl = int(os.environ.get('CACHE_TTL', 60))
+    if ttl <= 0:
+        return NullCache()
+    return LRUCache(maxsize=int(os.environ.get('CACHE_MAXSIZE', 10000)), ttl=ttl)
+
+backend = default_backend()
+
+
+def set_backend(new_backend):
+    global backend
+    backend = new_backend
+
+def stats():
+    return backend.stats()
+
+# Las claves llevan la version de la tabla que leyo el pedido (la misma del
+# ETag). La version esta en la base y el proceso la recuerda VERSION_TTL
+# segundos, asi que una escritura de otro worker o de un comando (`flask
+# data import`, `flask popularity reconcile`) cambia la clave a lo sumo
+# VERSION_TTL segundos despues; las de este proceso, enseguida. Una carga
+# que termina despues de un commit queda guardada bajo la version vieja,
+# que nadie vuelve a pedir.
+# La clave lleva tambien la base y la replica de la que se leyo (cache_scope).
+def _cached(table, key, loader):
+    scope = cache_scope()
+    if scope is False:
+        return loader()
+    version = table_version(table)
+    key = (table, version, scope) + key
+    value = backend.get(key)
+    if value is MISSING:
+        value = loader()
+        if value is not None:
+            backend.set(key, value)
+    return value
+
+def cached_entity(table, entity_id, loader):
+    return _cached(table, (entity_id,), loader)
+
+def cached_list(table, loader, variant=''):
+    return _cached(table, ('list', variant), loader)
+
+
+########################
+#  Eventos de sesion   #
+########################
+
+def mark_dirty(session, table):
+    # Para escrituras que no pasan por el ORM (insert/update/delete de Core):
+    # la version de la tabla (cache y ETag) sube cuando la transaccion hace commit
+    bump_version(session, table)
+
+def _after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table is not None:
+            mark_dirty(session, table)
+
+def _after_commit(session):
+    if not session.in_nested_transaction():
+        commit_bumped(session)
+
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None:
+        publish_versions(session)
+
+def _after_rollback(session):
+    clear_bumped(session)
+
+def setup_cache(app):
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
+        event.listen(db.session, 'after_transaction_end', _after_transaction_end)
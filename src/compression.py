@@ -0,0 +1,175 @@
+import os
+import zlib
+from werkzeug.http import parse_accept_header
+from utils import env_flag
+
+# brotli es opcional: si no esta instalado solo se ofrece gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compresion de respuestas como middleware WSGI: negocia br/gzip con
+# Accept-Encoding, deja sin comprimir los cuerpos chicos, los 304/204, los
+# HEAD y lo que ya viene codificado, y comprime por partes las respuestas en
+# streaming (cada parte sale con un flush para que el cliente no espere).
+
+COMPRESS_ENABLED = env_flag('COMPRESS_ENABLED', 'true')
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+COMPRESS_BR_QUALITY = int(os.environ.get('COMPRESS_BR_QUALITY', 4))
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript',
+                      'application/xml', 'image/svg+xml')
+
+
+def available_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def negotiate(accept_encoding):
+    # 'br', 'gzip' o None (sin comprimir), respetando los q= del cliente
+    if not accept_encoding:
+        return None
+    return parse_accept_header(accept_encoding).best_match(available_encodings())
+
+def is_compressible(content_type):
+    mimetype = (content_type or '').split(';', 1)[0].strip().lower()
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+class Compressor:
+    def __init__(self, encoding, level=COMPRESS_LEVEL, quality=COMPRESS_BR_QUALITY):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._obj = brotli.Compressor(quality=quality)
+        else:
+            # wbits=31: formato gzip (cabecera y CRC), no deflate crudo
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def flush(self):
+        # Vacia lo pendiente sin cerrar el stream
+        if self.encoding == 'br':
+            return self._obj.flush()
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._obj.finish()
+        return self._obj.flush(zlib.Z_FINISH)
+
+def compress(data, encoding, level=COMPRESS_LEVEL, quality=COMPRESS_BR_QUALITY):
+    compressor = Compressor(encoding, level, quality)
+    return compressor.compress(data) + compressor.finish()
+
+
+def _header(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+def _add_vary(headers):
+    vary = _header(headers, 'Vary')
+    if vary is None:
+        return headers + [('Vary', 'Accept-Encoding')]
+    if 'accept-encoding' in vary.lower() or vary.strip() == '*':
+        return headers
+    return [(k, v) for k, v in headers if k.lower() != 'vary'] + [('Vary', vary + ', Accept-Encoding')]
+
+
+class CompressionMiddleware:
+    def __init__(self, app, min_size=COMPRESS_MIN_SIZE, level=COMPRESS_LEVEL, quality=COMPRESS_BR_QUALITY):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.quality = quality
+
+    def __call__(self, environ, start_response):
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return lambda data: None
+
+        body = self.app(environ, capture)
+        status, headers, exc_info = captured
+        if not is_compressible(_header(headers, 'Content-Type')):
+            start_response(status, headers, exc_info)
+            return body
+
+        # Los caches tienen que distinguir por Accept-Encoding aunque esta
+        # respuesta en particular salga sin comprimir
+        headers = _add_vary(headers)
+        encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING'))
+        code = int(status.split(' ', 1)[0])
+        if encoding is None or environ['REQUEST_METHOD'] == 'HEAD' or code < 200 or code in (204, 206, 304) \
+                or _header(headers, 'Content-Encoding') is not None \
+                or 'no-transform' in (_header(headers, 'Cache-Control') or ''):
+            start_response(status, headers, exc_info)
+            return body
+
+        length = _header(headers, 'Content-Length')
+        if length is not None and int(length) < self.min_size:
+            start_response(status, headers, exc_info)
+            return body
+        return self._compressed(body, status, headers, exc_info, encoding, length, start_response)
+
+    def _compressed(self, body, status, headers, exc_info, encoding, length, start_response):
+        # Se junta hasta min_size para decidir: si el cuerpo termina antes
+        # (streaming corto) sale tal cual
+        iterator = iter(body)
+        buffered = []
+        size = 0
+        exhausted = False
+        while size < self.min_size:
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                exhausted = True
+                break
+            buffered.append(chunk)
+            size += len(chunk)
+
+        if exhausted and size < self.min_size:
+            _close(body)
+            start_response(status, headers, exc_info)
+            return buffered
+
+        compressor = Compressor(encoding, self.level, self.quality)
+        headers = [(k, v) for k, v in headers if k.lower() != 'content-length']
+        headers.append(('Content-Encoding', encoding))
+        if exhausted or length is not None:
+            # Cuerpo completo en memoria: un solo bloque con Content-Length
+            data = compressor.compress(b''.join(buffered) + b''.join(iterator)) + compressor.finish()
+            _close(body)
+            headers.append(('Content-Length', str(len(data))))
+            start_response(status, headers, exc_info)
+            return [data]
+
+        start_response(status, headers, exc_info)
+        return self._stream(body, iterator, buffered, compressor)
+
+    def _stream(self, body, iterator, buffered, compressor):
+        try:
+            yield compressor.compress(b''.join(buffered)) + compressor.flush()
+            for chunk in iterator:
+                if chunk:
+                    yield compressor.compress(chunk) + compressor.flush()
+            yield compressor.finish()
+        finally:
+            _close(body)
+
+def _close(body):
+    if hasattr(body, 'close'):
+        body.close()
+
+
+def setup_compression(app):
+    if not COMPRESS_ENABLED:
+        return
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app)
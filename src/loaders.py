@@ -0,0 +1,44 @@
+from flask import g, has_request_context
+from models import db
+
+# Chequeos de existencia por id con un cargador por pedido y por tabla:
+# missing() resuelve todos los ids que no conoce con un solo IN (...) por
+# tandas, y lo resuelto queda en memoria hasta que termina el pedido, asi
+# que volver a preguntar por el mismo id no vuelve a ir a la base.
+#
+#     if not loader(User).exists(user_id): ...
+#     missing = loader(Planets).missing(planet_ids)
+
+IN_CHUNK = 500
+
+
+class IdLoader:
+    def __init__(self, model):
+        self.model = model
+        self.found = {}
+
+    def load(self, ids):
+        # {id: existe} para los ids pedidos; los que no se conocian se
+        # resuelven con SELECT id ... WHERE id IN (...)
+        pending = list({id for id in ids if id is not None and id not in self.found})
+        for start in range(0, len(pending), IN_CHUNK):
+            chunk = pending[start:start + IN_CHUNK]
+            existing = {id for (id,) in db.session.query(self.model.id).filter(self.model.id.in_(chunk))}
+            self.found.update((id, id in existing) for id in chunk)
+        return {id: self.found[id] for id in ids if id is not None}
+
+    def exists(self, id):
+        return self.load([id]).get(id, False)
+
+    def missing(self, ids):
+        return {id for id, exists in self.load(ids).items() if not exists}
+
+
+def loader(model):
+    # Cargador del pedido actual; fuera de un pedido (CLI, scripts) uno nuevo
+    if not has_request_context():
+        return IdLoader(model)
+    loaders = g.setdefault('loaders', {})
+    if model not in loaders:
+        loaders[model] = IdLoader(model)
+    return loaders[model]
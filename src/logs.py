@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+# Los pedidos solo encolan el registro; un thread aparte (QueueListener) lo
+# formatea y lo escribe, asi la E/S nunca bloquea al handler.
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_MAX_CHARS = int(os.environ.get('LOG_MAX_CHARS', 2000))
+# Ej: LOG_SAMPLING="api=0.01,sql.profiler=0.1"
+LOG_SAMPLING = os.environ.get('LOG_SAMPLING', '')
+
+_listener = None
+
+
+def debug_event(logger, event, **fields):
+    # Evento estructurado de debug: si DEBUG esta apagado no cuesta nada mas
+    # que el isEnabledFor (no se arma ni se serializa el payload)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(event, extra={"fields": fields})
+
+def info_event(logger, event, **fields):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(event, extra={"fields": fields})
+
+
+def truncate(text, limit=LOG_MAX_CHARS):
+    if len(text) <= limit:
+        return text
+    return '%s...[%d caracteres mas]' % (text[:limit], len(text) - limit)
+
+def truncate_value(value, limit=LOG_MAX_CHARS):
+    # Para el JSON se recorta cada valor y no la linea ya serializada, que
+    # quedaba como JSON invalido. Un valor que no es texto y no entra se
+    # reemplaza por su JSON recortado.
+    if isinstance(value, str):
+        return truncate(value, limit)
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = json.dumps(value, default=str)
+    return value if len(text) <= limit else truncate(text, limit)
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": truncate(record.getMessage()),
+        }
+        for key, value in getattr(record, 'fields', {}).items():
+            entry[key] = truncate_value(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = truncate(record.exc_text)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            text += ' ' + json.dumps(fields, default=str)
+        return truncate(text)
+
+
+class SamplingFilter(logging.Filter):
+    # Deja pasar solo una fraccion de los registros de ciertos loggers
+    # (y sus hijos). Los WARNING y superiores nunca se descartan.
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        name = record.name
+        while name:
+            if name in self.rates:
+                return random.random() < self.rates[name]
+            name = name.rpartition('.')[0]
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    # Si la cola se llena se descarta el registro en lugar de esperar
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record):
+        # A diferencia de QueueHandler.prepare no formatea el registro entero:
+        # solo resuelve los args; los campos los serializa el listener
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def parse_sampling(spec):
+    rates = {}
+    for item in spec.split(','):
+        if '=' in item:
+            name, rate = item.split('=', 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+def setup_logging(app):
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JSONFormatter() if LOG_FORMAT == 'json'
+                        else TextFormatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+
+    handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    rates = parse_sampling(LOG_SAMPLING)
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    app.logger.handlers = []
+    app.logger.propagate = True
+
+    _listener = QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
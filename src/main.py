@@ -2,57 +2,142 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for
-from flask_migrate import Migrate
-from flask_swagger import swagger
+from flask import Flask, Blueprint, request, jsonify, url_for, current_app
 from flask_cors import CORS
-from utils import APIException, generate_sitemap
-from admin import setup_admin
+from utils import APIException, generate_sitemap, env_flag, is_id
+from pagination import paginate, page_response, page_args, encode_cursor
+from serializers import project, json_response
+from streaming import wants_stream, stream_response
+from cache import setup_cache, cached_entity, cached_list
+from versions import conditional, entity_response
+from search import search, MAX_QUERY_CHARS
+from popularity import setup_popularity, top_n, top_favorited
+from transfer import setup_transfer, export_response
+from queries import add_favorite, missing_reference, delete_favorite, bulk_create, MAX_BULK_ITEMS, \
+    sync_favorites
+from loaders import loader
 from models import db, User, Planets, Characters, Favorites
+from pool import engine_options, setup_pool
+from replicas import replica_urls, replica_binds, setup_replicas
+from profiler import setup_profiler
+from compression import setup_compression
+from admission import setup_admission, cost
+from logs import setup_logging, debug_event
 #from models import Person
+from sqlalchemy.orm import selectinload
 import json 
+import logging
 
-app = Flask(__name__)
-app.url_map.strict_slashes = False
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DB_CONNECTION_STRING')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-MIGRATE = Migrate(app, db)
-db.init_app(app)
-CORS(app)
-setup_admin(app)
+logger = logging.getLogger('api')
+
+api = Blueprint('api', __name__)
 
 # Handle/serialize errors like a JSON object
-@app.errorhandler(APIException)
 def handle_invalid_usage(error):
     return jsonify(error.to_dict()), error.status_code
 
+def create_app(config=None):
+    app = Flask(__name__)
+    setup_logging(app)
+    app.url_map.strict_slashes = False
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DB_CONNECTION_STRING')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Extensiones pesadas: se importan solo si estan habilitadas
+    app.config['ADMIN_ENABLED'] = env_flag('ADMIN_ENABLED', 'true')
+    app.config['METRICS_ENABLED'] = env_flag('METRICS_ENABLED', 'true')
+    app.config['MIGRATE_ENABLED'] = env_flag('MIGRATE_ENABLED', 'true')
+    app.config['ADMISSION_ENABLED'] = env_flag('ADMISSION_ENABLED', 'true')
+    app.config['DB_REPLICAS'] = replica_urls()
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    app.config.setdefault('SQLALCHEMY_BINDS', replica_binds(app.config['DB_REPLICAS'], engine_options))
+
+    db.init_app(app)
+    setup_pool(app)
+    setup_replicas(app)
+    CORS(app)
+    setup_cache(app)
+    setup_popularity(app)
+    setup_transfer(app)
+    setup_profiler(app)
+    setup_compression(app)
+    if app.config['MIGRATE_ENABLED']:
+        # flask_migrate importa alembic (y mako): solo hace falta para `flask db`
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    if app.config['ADMIN_ENABLED']:
+        from admin import setup_admin
+        setup_admin(app)
+    if app.config['METRICS_ENABLED']:
+        from metrics import setup_metrics
+        setup_metrics(app)
+    # Despues de metrics: sus before_request corren en orden de registro, y
+    # asi los 429/503 del control de admision tambien quedan en la latencia
+    setup_admission(app)
+
+    app.register_error_handler(APIException, handle_invalid_usage)
+    app.register_blueprint(api)
+    return app
+
+# Serializa una fila por id, None si no existe
+def serialize_one(model, id):
+    row = project(model).filter(model.id == id).first()
+    if row is None:
+        return None
+    return dict(zip(model.serialize_columns, row))
+
+# Alta masiva: recibe una lista de objetos y responde el resultado de cada uno
+def bulk_add(model, fields, unique):
+    # JSON invalido o vacio: None, y tambien es 400
+    body = request.get_json(silent=True)
+    if not isinstance(body, list):
+        raise APIException('Se esperaba una lista', status_code=400)
+    if len(body) > MAX_BULK_ITEMS:
+        raise APIException('Maximo %d elementos por pedido' % MAX_BULK_ITEMS, status_code=400)
+
+    results = bulk_create(model, body, fields, unique)
+    db.session.commit()
+    response_body = {
+        "created": sum(1 for r in results if r["status"] == "created"),
+        "duplicate": sum(1 for r in results if r["status"] == "duplicate"),
+        "invalid": sum(1 for r in results if r["status"] == "invalid"),
+        "results": results
+    }
+    return jsonify(response_body), 200
+
 # generate sitemap with all your endpoints
-@app.route('/')
+@api.route('/')
 def sitemap():
-    return generate_sitemap(app)
+    return generate_sitemap(current_app)
 
 ########################
 #       Usuarios       #
 ########################
 
 # Muestra todos los usuarios
-@app.route('/user', methods=['GET'])
+@api.route('/user', methods=['GET'])
+@cost('list')
+@conditional('user')
 def handle_hello():
-    user = User.query.all()
-    results = list(map(lambda x: x.serialize(), user))
-    print (results)
-    return jsonify(results), 200
+    # Tabla completa en streaming (?stream=1 o Accept: application/x-ndjson)
+    if wants_stream():
+        return stream_response(User)
+
+    results, next_cursor = cached_list('user', lambda: paginate(User), request.query_string)
+    debug_event(logger, 'user_list', results=results)
+    return page_response(results, next_cursor), 200
 
 # Busca por id de usuario
-@app.route('/user/<int:user_id>', methods=['GET'])
+@api.route('/user/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    userId = User.query.filter_by(id=user_id).first()
-    usuario = userId.serialize()
-    return jsonify(usuario), 200
+    usuario = cached_entity('user', user_id, lambda: serialize_one(User, user_id))
+    if usuario is None:
+        raise APIException('No existe el usuario', status_code=404)
+    return entity_response('user', usuario)
 
 
 # Alta de un usuario
-@app.route('/user', methods=['POST'])
+@api.route('/user', methods=['POST'])
 def addUser():
     body = json.loads(request.data)
 
@@ -78,8 +163,82 @@ def addUser():
     }
     return jsonify(response_body), 400
 
+# Alta masiva de usuarios
+@api.route('/user/bulk', methods=['POST'])
+@cost('heavy')
+def addUsers_bulk():
+    return bulk_add(User, ["name", "lastname", "username", "email", "password"], ["email", "username"])
+
+# Favoritos de un usuario con los nombres de planetas y personajes
+@api.route('/user/<int:user_id>/favorites', methods=['GET'])
+@cost('list')
+@conditional('favorites', 'user', 'planets', 'characters')
+def get_userFavorites(user_id):
+    # Una consulta para el usuario y una (selectinload) para sus favoritos con
+    # planeta y personaje unidos: no depende de cuantos favoritos tenga
+    usuario = User.query.options(
+        selectinload(User.favoritoUser).joinedload(Favorites.planets),
+        selectinload(User.favoritoUser).joinedload(Favorites.characters)
+    ).filter_by(id=user_id).first()
+
+    if usuario is None:
+        raise APIException('No existe el usuario', status_code=404)
+
+    results = []
+    for favorito in usuario.favoritoUser:
+        item = favorito.serialize()
+        item["planet"] = favorito.planets.serialize() if favorito.planets else None
+        item["character"] = favorito.characters.serialize() if favorito.characters else None
+        results.append(item)
+    return jsonify(results), 200
+
+# Agrega y borra favoritos de un usuario en una sola transaccion
+# body: {"add": {"planets": [..], "characters": [..]}, "remove": {"planets": [..], "characters": [..]}}
+@api.route('/user/<int:user_id>/favorites', methods=['PATCH'])
+def patch_userFavorites(user_id):
+    # JSON invalido o vacio: None, y tambien es 400
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        raise APIException('Se esperaba un objeto', status_code=400)
+
+    ids = {}
+    for action in ("add", "remove"):
+        section = body.get(action) or {}
+        if not isinstance(section, dict):
+            raise APIException('%s debe ser un objeto' % action, status_code=400)
+        for kind in ("planets", "characters"):
+            values = section.get(kind) or []
+            if not isinstance(values, list) or not all(is_id(v) for v in values):
+                raise APIException('%s.%s debe ser una lista de ids' % (action, kind), status_code=400)
+            ids[action, kind] = set(values)
+
+    if ids["add", "planets"] & ids["remove", "planets"] or ids["add", "characters"] & ids["remove", "characters"]:
+        raise APIException('Un mismo id no puede agregarse y borrarse a la vez', status_code=400)
+
+    if not loader(User).exists(user_id):
+        raise APIException('No existe el usuario', status_code=404)
+
+    # Chequea con un IN por tabla que existan todos los ids a agregar
+    missing_planets = loader(Planets).missing(ids["add", "planets"])
+    missing_characters = loader(Characters).missing(ids["add", "characters"])
+    if missing_planets or missing_characters:
+        response_body = {
+            "msg": "Ids inexistentes",
+            "planets": sorted(missing_planets),
+            "characters": sorted(missing_characters)
+        }
+        return jsonify(response_body), 400
+
+    added, removed = sync_favorites(user_id,
+        add_planets=ids["add", "planets"], add_characters=ids["add", "characters"],
+        remove_planets=ids["remove", "planets"], remove_characters=ids["remove", "characters"])
+    db.session.commit()
+
+    response_body = {"msg": "Favoritos actualizados", "added": added, "removed": removed}
+    return jsonify(response_body), 200
+
 # Modifica un usuario por id
-@app.route('/user/<int:user_id>', methods=['PUT'])
+@api.route('/user/<int:user_id>', methods=['PUT'])
 def usersModif_porId(user_id):
     usuario = User.query.filter_by(id=user_id).first()
     body = json.loads(request.data)
@@ -103,7 +262,7 @@ def usersModif_porId(user_id):
 
 
 # Borra un usuario
-@app.route('/user/<int:user_id>', methods=['DELETE'])
+@api.route('/user/<int:user_id>', methods=['DELETE'])
 def deleteUser(user_id):
     userId = User.query.filter_by(id=user_id).first()
   
@@ -121,22 +280,34 @@ def deleteUser(user_id):
 #       Planetas       #
 ########################
 # Muestra todos los planetas
-@app.route('/planets', methods=['GET'])
+@api.route('/planets', methods=['GET'])
+@cost('list')
+@conditional('planets')
 def all_planets():
-    planetas = Planets.query.all()
-    results = list(map(lambda x: x.serialize(), planetas))
-    return jsonify(results), 200
+    # Tabla completa en streaming (?stream=1 o Accept: application/x-ndjson)
+    if wants_stream():
+        return stream_response(Planets)
+
+    results, next_cursor = cached_list('planets', lambda: paginate(Planets), request.query_string)
+    return page_response(results, next_cursor), 200
 
 # Muestra planetas por id
-@app.route('/planets/<int:planet_id>', methods=['GET'])
+@api.route('/planets/<int:planet_id>', methods=['GET'])
 def planets_porId(planet_id):
-    planeta = Planets.query.filter_by(id=planet_id).first()
-    planet = planeta.serialize()
-    return jsonify(planet), 200
+    planet = cached_entity('planets', planet_id, lambda: serialize_one(Planets, planet_id))
+    if planet is None:
+        raise APIException('No existe el planeta', status_code=404)
+    return entity_response('planets', planet)
+
 
+# Planetas con mas favoritos: /planets/top?n=10
+@api.route('/planets/top', methods=['GET'])
+@conditional('favorites', 'planets')
+def top_planets():
+    return json_response(top_favorited(Planets, top_n(request.args))), 200
 
 # Alta de un planeta
-@app.route('/planets', methods=['POST'])
+@api.route('/planets', methods=['POST'])
 def addPlanets():
     body = json.loads(request.data)
 
@@ -158,8 +329,14 @@ def addPlanets():
     }
     return jsonify(response_body), 400
 
+# Alta masiva de planetas
+@api.route('/planets/bulk', methods=['POST'])
+@cost('heavy')
+def addPlanets_bulk():
+    return bulk_add(Planets, ["name"], ["name"])
+
 # Modifica un planeta por id
-@app.route('/planets/<int:planets_id>', methods=['PUT'])
+@api.route('/planets/<int:planets_id>', methods=['PUT'])
 def planetsModif_porId(planets_id):
     planeta = Planets.query.filter_by(id=planets_id).first()
     body = json.loads(request.data)
@@ -175,7 +352,7 @@ def planetsModif_porId(planets_id):
     return jsonify(response_body), 400
 
 # Borra un Planeta
-@app.route('/planets/<int:planet_id>', methods=['DELETE'])
+@api.route('/planets/<int:planet_id>', methods=['DELETE'])
 def deletePlanet(planet_id):
     planetId = Planets.query.filter_by(id=planet_id).first()
   
@@ -193,22 +370,34 @@ def deletePlanet(planet_id):
 #       Personajes     #
 ########################
 # Muestra todos los personajes
-@app.route('/characters', methods=['GET'])
+@api.route('/characters', methods=['GET'])
+@cost('list')
+@conditional('characters')
 def all_characters():
-    personaje = Characters.query.all()
-    results = list(map(lambda x: x.serialize(), personaje))
-    return jsonify(results), 200
+    # Tabla completa en streaming (?stream=1 o Accept: application/x-ndjson)
+    if wants_stream():
+        return stream_response(Characters)
+
+    results, next_cursor = cached_list('characters', lambda: paginate(Characters), request.query_string)
+    return page_response(results, next_cursor), 200
 
 # Muestra personajes por id
-@app.route('/characters/<int:characters_id>', methods=['GET'])
+@api.route('/characters/<int:characters_id>', methods=['GET'])
 def characters_porId(characters_id):
-    personaje = Characters.query.filter_by(id=characters_id).first()
-    char = personaje.serialize()
-    return jsonify(char), 200
+    char = cached_entity('characters', characters_id, lambda: serialize_one(Characters, characters_id))
+    if char is None:
+        raise APIException('No existe el personaje', status_code=404)
+    return entity_response('characters', char)
+
 
+# Personajes con mas favoritos: /characters/top?n=10
+@api.route('/characters/top', methods=['GET'])
+@conditional('favorites', 'characters')
+def top_characters():
+    return json_response(top_favorited(Characters, top_n(request.args))), 200
 
 # Modifica un personaje por id
-@app.route('/characters/<int:characters_id>', methods=['PUT'])
+@api.route('/characters/<int:characters_id>', methods=['PUT'])
 def charactersModif_porId(characters_id):
     personaje = Characters.query.filter_by(id=characters_id).first()
     body = json.loads(request.data)
@@ -226,7 +415,7 @@ def charactersModif_porId(characters_id):
     return jsonify(response_body), 400
 
 # Alta de un personaje
-@app.route('/characters', methods=['POST'])
+@api.route('/characters', methods=['POST'])
 def add_Characters():
     body = json.loads(request.data)
 
@@ -249,8 +438,14 @@ def add_Characters():
     }
     return jsonify(response_body), 400
 
+# Alta masiva de personajes
+@api.route('/characters/bulk', methods=['POST'])
+@cost('heavy')
+def add_Characters_bulk():
+    return bulk_add(Characters, ["name", "lastName"], ["name"])
+
 # Borra un Personaje
-@app.route('/characters/<int:character_id>', methods=['DELETE'])
+@api.route('/characters/<int:character_id>', methods=['DELETE'])
 def deletePersonaje(character_id):
     personajeId = Characters.query.filter_by(id=character_id).first()
   
@@ -263,27 +458,67 @@ def deletePersonaje(character_id):
     response_body = {"msg": "Personaje borrado"}
     return jsonify(response_body), 200
 
+########################
+#       Busqueda       #
+########################
+# Busca personajes y planetas por nombre (prefijo y subcadena): /search?q=sky
+@api.route('/search', methods=['GET'])
+@cost('list')
+@conditional('characters', 'planets')
+def search_names():
+    q = request.args.get('q', '').strip()
+    if not q:
+        raise APIException('Falta el parametro q', status_code=400)
+    if len(q) > MAX_QUERY_CHARS:
+        raise APIException('El parametro q admite hasta %d caracteres' % MAX_QUERY_CHARS, status_code=400)
+
+    # El cursor de la busqueda es la posicion dentro del ranking
+    limit, offset = page_args()
+    offset = offset or 0
+    if offset < 0:
+        raise APIException('Cursor invalido', status_code=400)
+
+    results, has_more = search(q, limit, offset)
+    next_cursor = encode_cursor([offset + len(results)]) if has_more else None
+    return page_response(results, next_cursor), 200
+
+########################
+#     Exportacion      #
+########################
+# Todas las tablas en NDJSON o CSV, en streaming: /export?format=csv
+# Requiere Authorization: Bearer <EXPORT_TOKEN> (incluye las contrasenias)
+@api.route('/export', methods=['GET'])
+@cost('heavy')
+def export_data():
+    return export_response()
+
 ########################
 #       Favoritos      #
 ########################
 # Muestra todos los favoritos de todas las personas
-@app.route('/favorits', methods=['GET'])
+@api.route('/favorits', methods=['GET'])
+@cost('list')
+@conditional('favorites')
 def favoritos():
-    favoritos = Favorites.query.all()
-    results = list(map(lambda x: x.serialize(), favoritos))
-    print (results)
-    return jsonify(results), 200
+    # Tabla completa en streaming (?stream=1 o Accept: application/x-ndjson)
+    if wants_stream():
+        return stream_response(Favorites)
+
+    results, next_cursor = cached_list('favorites', lambda: paginate(Favorites), request.query_string)
+    debug_event(logger, 'favorites_list', results=results)
+    return page_response(results, next_cursor), 200
 
 # Muestra favorito por id 
-@app.route('/favorits/<int:favorits_id>', methods=['GET'])
+@api.route('/favorits/<int:favorits_id>', methods=['GET'])
 def favorits_porId(favorits_id):
-    favorito = Favorites.query.filter_by(id=favorits_id).first()
-    favorite = favorito.serialize()
-    print(favorite)
-    return jsonify(favorite), 200
+    favorite = serialize_one(Favorites, favorits_id)
+    if favorite is None:
+        raise APIException('No existe el favorito', status_code=404)
+    debug_event(logger, 'favorite', favorite=favorite)
+    return entity_response('favorites', favorite)
 
 # Borra la lista de los favoritos
-@app.route('/favorite/<int:fav_id>', methods=['DELETE'])
+@api.route('/favorite/<int:fav_id>', methods=['DELETE'])
 def deleteFavorite(fav_id):
     favId = Favorites.query.filter_by(id=fav_id).first()
   
@@ -299,216 +534,112 @@ def deleteFavorite(fav_id):
 
 
 # Borra un determinado planeta de la lista de los favoritos
-@app.route('/favorite/planet/<int:user_id>/<int:planet_id>', methods=['DELETE'])
+@api.route('/favorite/planet/<int:user_id>/<int:planet_id>', methods=['DELETE'])
 def deleteFavoritePlanet(user_id, planet_id):
-    
-    # Controla que exista el usuario
-    favUser = Favorites.query.filter_by(id_user=user_id).first()
-    if favUser is None: 
-        response_body = {"msg": "Usuario no encontrado"}
-        return jsonify(response_body), 400
 
-     # Controla que exista el planeta
-    favId = Favorites.query.filter_by(id_planets=planet_id).first()
-    if favId is None: 
-        response_body = {"msg": "Planeta no encontrado"}
+    # Un solo DELETE por el indice (id_user, id_planets)
+    if delete_favorite(user_id, planet_id=planet_id) == 0:
+        response_body = {"msg": "Favorito no encontrado"}
         return jsonify(response_body), 400
 
-    #Borra el planeta segun el usuario
-    favorito = Favorites.query.filter_by(id_user=user_id).filter_by(id_planets=planet_id).first()
-#    print(favorito)
-
-    db.session.delete(favorito)
     db.session.commit()
-   
     response_body = {"msg": "Favorito borrado"}
     return jsonify(response_body), 200
 
 # Borra un determinado personaje de la lista de los favoritos
-@app.route('/favorite/character/<int:user_id>/<int:characters_id>', methods=['DELETE'])
+@api.route('/favorite/character/<int:user_id>/<int:characters_id>', methods=['DELETE'])
 def deleteFavoriteCharacter(user_id, characters_id):
-    
-    # Controla que exista el usuario
-    favUser = Favorites.query.filter_by(id_user=user_id).first()
-    if favUser is None: 
-        response_body = {"msg": "Usuario no encontrado"}
-        return jsonify(response_body), 400
 
-     # Controla que exista el personaje
-    favId = Favorites.query.filter_by(id_characters=characters_id).first()
-    if favId is None: 
-        response_body = {"msg": "Personaje no encontrado"}
+    # Un solo DELETE por el indice (id_user, id_characters)
+    if delete_favorite(user_id, character_id=characters_id) == 0:
+        response_body = {"msg": "Favorito no encontrado"}
         return jsonify(response_body), 400
 
-    #Borra el planeta segun el usuario
-    favorito = Favorites.query.filter_by(id_user=user_id).filter_by(id_characters=characters_id).first()
-
-    db.session.delete(favorito)
     db.session.commit()
     response_body = {"msg": "Personaje favorito borrado"}
     return jsonify(response_body), 200
 
 # Le agrega un nuevo planeta favorito a un usuario
-@app.route('/favorite/planet/<int:user_id>/<int:planet_id>', methods=['POST'])
+@api.route('/favorite/planet/<int:user_id>/<int:planet_id>', methods=['POST'])
 def add_FavoritePlanet(user_id, planet_id):
 
-    # Controla que exista el usuario
-    favUser = Favorites.query.filter_by(id_user=user_id).first()
-    if favUser:
-        # Controla que existan planetas
-        favId = Favorites.query.filter_by(id_planets=planet_id).first()
-        if favId: 
-            # Ya existe ese planeta para ese usuario
-            response_body = {"msg": "Planeta existente para ese usuario"}
-            return jsonify(response_body), 400
-        else: 
-            #Si no tiene ese planeta, lo agrega
-            new_Favorito = Favorites(id_user=user_id, id_planets=planet_id)
-        
-            db.session.add(new_Favorito)
-            db.session.commit()
-            
-            response_body = {"msg": "Favorito creado" }
-            return jsonify(response_body), 200
+    # Inserta si existen usuario y planeta y no estaba repetido
+    if add_favorite(user_id, planet_id=planet_id):
+        db.session.commit()
+        response_body = {"msg": "Favorito creado"}
+        return jsonify(response_body), 200
+
+    # No se inserto: se averigua por que
+    missing = missing_reference(user_id, planet_id=planet_id)
+    if missing == 'user':
+        response_body = {"msg": "No existe el usuario"}
+    elif missing == 'planet':
+        response_body = {"msg": "No existe el planeta"}
     else:
         # Ya existe ese planeta para ese usuario
-        response_body = {"msg": "No existe el usuario"}
-        return jsonify(response_body), 400
+        response_body = {"msg": "Planeta existente para ese usuario"}
+    return jsonify(response_body), 400
 
 # Le agrega un nuevo personaje favorito a un usuario
-@app.route('/favorite/character/<int:user_id>/<int:char_id>', methods=['POST'])
+@api.route('/favorite/character/<int:user_id>/<int:char_id>', methods=['POST'])
 def add_FavoriteChar(user_id, char_id):
 
-    # Controla que exista el usuario
-    favUser = Favorites.query.filter_by(id_user=user_id).first()
-    if favUser:
-        # Controla que exista el personaje
-        favId = Favorites.query.filter_by(id_characters=char_id).first()
-        if favId: 
-            # Ya existe ese personaje para ese usuario
-            response_body = {"msg": "Este personaje ya es favorito para ese usuario"}
-            return jsonify(response_body), 400
-        else: 
-            #Si no tiene ese personaje, lo agrega
-            new_Favorito = Favorites(id_user=user_id, id_characters=char_id)
-        
-            db.session.add(new_Favorito)
-            db.session.commit()
-            
-            response_body = {"msg": "Favorito creado" }
-            return jsonify(response_body), 200
+    # Inserta si existen usuario y personaje y no estaba repetido
+    if add_favorite(user_id, character_id=char_id):
+        db.session.commit()
+        response_body = {"msg": "Favorito creado"}
+        return jsonify(response_body), 200
+
+    # No se inserto: se averigua por que
+    missing = missing_reference(user_id, character_id=char_id)
+    if missing == 'user':
+        response_body = {"msg": "No existe el usuario"}
+    elif missing == 'character':
+        response_body = {"msg": "No existe el personaje"}
     else:
         # Ya existe ese personaje para ese usuario
-        response_body = {"msg": "No existe el usuario"}
-        return jsonify(response_body), 400
+        response_body = {"msg": "Este personaje ya es favorito para ese usuario"}
+    return jsonify(response_body), 400
 
 
 # Agrega un nuevo favorito
-@app.route('/favorite', methods=['POST'])
+@api.route('/favorite', methods=['POST'])
 def add_Favorites():
-    body = json.loads(request.data)
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        raise APIException('Se esperaba un objeto', status_code=400)
 
-    # Chequeo de ids de usuarios, planetas y personajes. 
-    existeUser = User.query.filter_by(id=body["id_user"]).first()
-    existePlanet = Planets.query.filter_by(id=body["id_planets"]).first()
-    existePers = Characters.query.filter_by(id=body["id_characters"]).first()
-
-     # Si se ingresa usuario, planeta y personaje.
-    if existeUser: 
-        if existePlanet:
-            if existePers:
-                # Chequea que exista ese usuario en la tabla de favoritos
-                userinFav = Favorites.query.filter_by(id_user=body["id_user"]).first()
-                # Si no existe crea el nuevo favorito con planeta y personaje
-                if userinFav is None:
-                    new_Favorito = Favorites(id_user=body["id_user"], 
-                    id_planets=body["id_planets"], id_characters=body["id_characters"])
-                
-                    db.session.add(new_Favorito)
-                    db.session.commit()
-                    
-                    response_body = {"msg": "Favorito creado"}
-                    return jsonify(response_body), 200
-                else: 
-                    #Si existe el usuario, chequea que no tenga ese planeta
-                    planetFav = Favorites.query.filter_by(id_planets=body["id_planets"]).first()
-                    #Si no encuentra ese planeta, chequea que no tenga ningun personaje
-                    if planetFav is None:
-                        persFav = Favorites.query.filter_by(id_characters=body["id_characters"]).first()
-                        # Si no encuentra ningun personaje, crea todo
-                        if persFav is None: 
-                            new_Favorito = Favorites(id_user=body["id_user"], 
-                            id_planets=body["id_planets"], id_characters=body["id_characters"])
-                
-                            db.session.add(new_Favorito)
-                            db.session.commit()
-                    
-                            response_body = {"msg": "Favorito creado"}
-                            return jsonify(response_body), 200
-                        else:
-                            #Modifica el planeta
-                            if "id_planets" in body:
-                                planetFav.id_planets = body["id_planets"]
-                            db.session.commit()
-                            response_body = {"msg": "Planeta modificado"}
-            else: 
-                response_body = {"msg": "Personaje no creado"}
-                return jsonify(response_body), 400
-        else: 
-            response_body = {"msg": "Planeta no creado"}
-            return jsonify(response_body), 400
-    else: 
-        response_body = {"msg": "Usuario no creado"}
+    user_id = body.get("id_user")
+    planet_id = body.get("id_planets")
+    character_id = body.get("id_characters")
+
+    if user_id is None or (planet_id is None and character_id is None):
+        response_body = {"msg": "Error al agregar favoritos"}
         return jsonify(response_body), 400
-    #print(body["id_characters"])
-   
-    # Si se ingresa usuario y planeta solamente.
-    if existeUser:
-        if existePlanet:
-            new_Favorito = Favorites(id_user=body["id_user"], 
-            id_planets=body["id_planets"])
-        
-            db.session.add(new_Favorito)
-            db.session.commit()
-            
-            response_body = {
-                "msg": "Favorito creado" 
-            }
-            return jsonify(response_body), 200
-        else: 
-            response_body = {"msg": "Planeta no creado"}
-            return jsonify(response_body), 200
-    else: 
-        response_body = {"msg": "Usuario no creado"}
+    # Los ids van directo al INSERT ... SELECT
+    if not all(is_id(id) for id in (user_id, planet_id, character_id) if id is not None):
+        response_body = {"msg": "Los ids deben ser numeros enteros"}
+        return jsonify(response_body), 400
+
+    # Usuario con planeta, con personaje o con ambos, en un solo INSERT
+    if add_favorite(user_id, planet_id=planet_id, character_id=character_id):
+        db.session.commit()
+        response_body = {"msg": "Favorito creado"}
         return jsonify(response_body), 200
-        
-    # Si se ingresa usuario y personaje solamente.
-    if existeUser:
-        if existePers:
-            new_Favorito = Favorites(id_user=body["id_user"], 
-            id_characters=body["id_characters"])
-        
-            db.session.add(new_Favorito)
-            db.session.commit()
-            
-            response_body = {
-                "msg": "Favorito creado" 
-            }
-            return jsonify(response_body), 200
-        else:
-            response_body = {"msg": "Personaje no creado"}
-            return jsonify(response_body), 200
-    else: 
+
+    missing = missing_reference(user_id, planet_id=planet_id, character_id=character_id)
+    if missing == 'user':
         response_body = {"msg": "Usuario no creado"}
-        return jsonify(response_body), 200
-   
-    response_body = {
-        "msg": "Error al agregar favoritos" 
-    }
+    elif missing == 'planet':
+        response_body = {"msg": "Planeta no creado"}
+    elif missing == 'character':
+        response_body = {"msg": "Personaje no creado"}
+    else:
+        response_body = {"msg": "Favorito ya creado"}
     return jsonify(response_body), 400
 
 
 # this only runs if `$ python src/main.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3000))
-    app.run(host='0.0.0.0', port=PORT, debug=False)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=PORT, debug=False)
\ No newline at end of file
@@ -0,0 +1,104 @@
+import os
+import time
+from flask import request, g, Response, current_app
+from prometheus_client import Histogram, Gauge, Summary, CollectorRegistry, generate_latest, \
+    CONTENT_TYPE_LATEST, REGISTRY, multiprocess
+import cache
+import pool
+
+# Con varios workers de gunicorn, PROMETHEUS_MULTIPROC_DIR apunta a un directorio
+# compartido donde cada proceso escribe sus valores (ver gunicorn.conf.py).
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Latencia de cada pedido',
+    ['endpoint', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Pedidos en curso',
+    ['endpoint'], multiprocess_mode='livesum')
+RESPONSE_SIZE = Summary(
+    'http_response_size_bytes', 'Tamanio del cuerpo de la respuesta',
+    ['endpoint', 'status'])
+
+POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Espera para obtener una conexion del pool',
+    buckets=pool.WAIT_BUCKETS)
+POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out', 'Conexiones en uso', multiprocess_mode='livesum')
+POOL_OVERFLOW = Gauge(
+    'db_pool_overflow', 'Conexiones por encima de pool_size', multiprocess_mode='livesum')
+POOL_TIMEOUTS = Gauge(
+    'db_pool_timeouts', 'Checkouts que vencieron DB_POOL_TIMEOUT', multiprocess_mode='livesum')
+
+CACHE_COUNTERS = Gauge(
+    'cache_operations', 'Contadores de la cache de entidades',
+    ['result'], multiprocess_mode='livesum')
+
+ADMISSION_COUNTERS = Gauge(
+    'admission_requests', 'Pedidos admitidos y rechazados por clase de costo',
+    ['cost', 'result'], multiprocess_mode='livesum')
+ADMISSION_IN_USE = Gauge(
+    'admission_in_use', 'Pedidos en curso por clase de costo',
+    ['cost'], multiprocess_mode='livesum')
+
+
+def _endpoint():
+    return request.endpoint or 'not_found'
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_endpoint = _endpoint()
+    IN_FLIGHT.labels(g.metrics_endpoint).inc()
+
+def _after_request(response):
+    start = g.get('metrics_start')
+    if start is None:
+        return response
+    endpoint = g.metrics_endpoint
+    status = str(response.status_code)
+    REQUEST_LATENCY.labels(endpoint, request.method, status).observe(time.perf_counter() - start)
+    if response.content_length is not None:
+        RESPONSE_SIZE.labels(endpoint, status).observe(response.content_length)
+    _update_gauges()
+    return response
+
+def _teardown_request(error):
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is not None:
+        IN_FLIGHT.labels(endpoint).dec()
+
+def _update_gauges():
+    # Los valores del pool y de la cache son de este proceso; con livesum
+    # /metrics muestra la suma de todos los workers vivos.
+    stats = pool.pool_stats()
+    if 'checked_out' in stats:
+        POOL_CHECKED_OUT.set(stats['checked_out'])
+        POOL_OVERFLOW.set(max(stats['overflow'], 0))
+    POOL_TIMEOUTS.set(stats['checkout_wait']['timeouts'])
+    cache_stats = cache.stats()
+    for result in ('hits', 'misses', 'evictions'):
+        CACHE_COUNTERS.labels(result).set(cache_stats[result])
+    admission = current_app.extensions.get('admission')
+    if admission is not None:
+        for name, counts in admission.stats().items():
+            for result in ('admitted', 'rate_limited', 'queue', 'busy'):
+                ADMISSION_COUNTERS.labels(name, result).set(counts[result])
+            ADMISSION_IN_USE.labels(name).set(counts['in_use'])
+
+def metrics_view():
+    _update_gauges()
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+def setup_metrics(app):
+    # create_app puede llamarse mas de una vez en el mismo proceso
+    if POOL_CHECKOUT_WAIT.observe not in pool.checkout_wait.listeners:
+        pool.checkout_wait.listeners.append(POOL_CHECKOUT_WAIT.observe)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
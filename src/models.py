@@ -1,74 +1,98 @@
 from flask_sqlalchemy import SQLAlchemy
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession manda las lecturas de los GET a las replicas (si hay)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+class Serializable:
+    # Columnas que se exportan en la API; las usa serialize() y tambien
+    # serializers.py para consultar solo esas columnas sin armar objetos
+    serialize_columns = ()
+    # Columnas por las que los listados aceptan ?columna= y ?sort=; solo las
+    # que tienen indice, para que el filtro y el orden no recorran la tabla
+    filter_columns = ()
+    sort_columns = ("id",)
+
+    def serialize(self):
+        return {name: getattr(self, name) for name in self.serialize_columns}
+
+class User(Serializable, db.Model):
+    serialize_columns = ("id", "name", "lastname", "username", "email")
+    filter_columns = ("username", "email")
+    sort_columns = ("id", "username", "email")
 
-class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), unique=False, nullable=False)
     lastname = db.Column(db.String(120), unique=False, nullable=False)
     username = db.Column(db.String(120), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(80), unique=False, nullable=False)
-    favoritoUser = db.relationship("Favorites", backref="user", cascade="all, delete-orphan", lazy=True)
+    # passive_deletes: la base borra los favoritos (ON DELETE CASCADE) sin
+    # que el ORM los cargue uno por uno
+    favoritoUser = db.relationship("Favorites", backref="user", cascade="all, delete-orphan", lazy=True,
+                                   passive_deletes=True)
 
     def __repr__(self):
         return '<User %r>' % self.id
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "lastname": self.lastname,
-            "username": self.username,
-            "email": self.email,
-            #"favorito": self.favorito
-        }
-
-class Characters(db.Model):
+class Characters(Serializable, db.Model):
+    serialize_columns = ("id", "name", "lastName")
+    filter_columns = ("name", "lastName")
+    sort_columns = ("id", "name", "lastName")
+
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120), unique=False, nullable=False)
-    lastName = db.Column(db.String(120), unique=False, nullable=False)
-    favoritoCharacters = db.relationship("Favorites", backref="characters", cascade="all, delete-orphan", lazy=True)
+    name = db.Column(db.String(120), unique=False, nullable=False, index=True)
+    lastName = db.Column(db.String(120), unique=False, nullable=False, index=True)
+    # Cantidad de favoritos que lo eligen (ver popularity.py)
+    favorites_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    favoritoCharacters = db.relationship("Favorites", backref="characters", cascade="all, delete-orphan", lazy=True,
+                                         passive_deletes=True)
+    __table_args__ = (
+        db.Index("ix_characters_favorites_count", "favorites_count", "id"),
+    )
 
     def __repr__(self):
         return '<Characters %r>' % self.id
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "lastName": self.lastName,
-            #"favorito": self.favorito
-        }
-
-class Planets(db.Model):
+class Planets(Serializable, db.Model):
+    serialize_columns = ("id", "name")
+    filter_columns = ("name",)
+    sort_columns = ("id", "name")
+
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(250), nullable=False)
-    favoritoPlanta = db.relationship("Favorites", backref="planets", cascade="all, delete-orphan", lazy=True)
+    name = db.Column(db.String(250), nullable=False, index=True)
+    favorites_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    favoritoPlanta = db.relationship("Favorites", backref="planets", cascade="all, delete-orphan", lazy=True,
+                                     passive_deletes=True)
+    __table_args__ = (
+        db.Index("ix_planets_favorites_count", "favorites_count", "id"),
+    )
 
     def __repr__(self):
         return '<Planets %r>' % self.id
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            #"favorito": self.favorito
-        }
+class Favorites(Serializable, db.Model):
+    serialize_columns = ("id", "id_user", "id_planets", "id_characters")
+    filter_columns = ("id_user", "id_planets", "id_characters")
 
-class Favorites(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    id_user = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
-    id_planets = db.Column(db.Integer, db.ForeignKey("planets.id"), nullable=True)
-    id_characters = db.Column(db.Integer, db.ForeignKey("characters.id"), nullable=True)
+    id_user = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    id_planets = db.Column(db.Integer, db.ForeignKey("planets.id", ondelete="CASCADE"), nullable=True)
+    id_characters = db.Column(db.Integer, db.ForeignKey("characters.id", ondelete="CASCADE"), nullable=True)
+    __table_args__ = (
+        db.Index("ix_favorites_user_planets", "id_user", "id_planets", unique=True),
+        db.Index("ix_favorites_user_characters", "id_user", "id_characters", unique=True),
+        db.Index("ix_favorites_planets", "id_planets"),
+        db.Index("ix_favorites_characters", "id_characters"),
+    )
 
     def __repr__(self):
         return '<Favorites %r>' % self.id
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "id_user": self.id_user,
-            "id_planets": self.id_planets,
-            "id_characters": self.id_characters
-        }
\ No newline at end of file
+class TableVersion(db.Model):
+    __tablename__ = 'table_version'
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return '<TableVersion %r>' % self.name
@@ -0,0 +1,208 @@
+import os
+import json
+import base64
+from collections import namedtuple
+from urllib.parse import urlencode
+from flask import request
+from utils import APIException
+from sqlalchemy import select, and_, or_
+from models import db
+from serializers import columns, to_dicts, json_response
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 500))
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except ValueError:
+        raise APIException('Cursor invalido', status_code=400)
+    if not isinstance(values, list):
+        raise APIException('Cursor invalido', status_code=400)
+    return values
+
+def page_limit(args):
+    # limit nunca supera MAX_PAGE_SIZE, aunque el cliente pida mas
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise APIException('Parametro limit invalido', status_code=400)
+    if limit < 1:
+        raise APIException('Parametro limit invalido', status_code=400)
+    return min(limit, MAX_PAGE_SIZE)
+
+def page_args(args=None):
+    if args is None:
+        args = request.args
+    limit = page_limit(args)
+    after = args.get('after')
+    if after is None:
+        return limit, None
+    values = decode_cursor(after)
+    if len(values) != 1 or not isinstance(values[0], int):
+        raise APIException('Cursor invalido', status_code=400)
+    return limit, values[0]
+
+
+# Campos, orden y filtros de los listados:
+# ?fields=id,name    columnas de la respuesta (de serialize_columns)
+# ?sort=-name        orden por columnas de sort_columns; '-' es descendente
+# ?name=Tatooine     igualdad sobre filter_columns (repetido: IN)
+# Todo se arma en el SELECT: nunca se filtra ni se ordena despues en Python.
+
+MAX_FILTER_VALUES = 100
+
+# fields: nombres de la respuesta; sort: ((nombre, descendente), ...) que
+# siempre termina en id; filters: ((nombre, [valores]), ...)
+Listing = namedtuple('Listing', 'fields sort filters')
+
+
+def default_listing(model):
+    return Listing(model.serialize_columns, (('id', False),), ())
+
+def _names(raw, name):
+    names = [item.strip() for item in raw.split(',')]
+    if not all(names):
+        raise APIException('Parametro %s invalido' % name, status_code=400)
+    return names
+
+def parse_fields(model, args):
+    raw = args.get('fields')
+    if raw is None:
+        return model.serialize_columns
+    names = _names(raw, 'fields')
+    invalid = [name for name in names if name not in model.serialize_columns]
+    if invalid:
+        raise APIException('Campos invalidos: %s' % ', '.join(invalid), status_code=400)
+    return tuple(dict.fromkeys(names))
+
+def parse_sort(model, args):
+    raw = args.get('sort')
+    if raw is None:
+        return (('id', False),)
+    sort = []
+    for item in _names(raw, 'sort'):
+        name = item.lstrip('-+')
+        if name not in model.sort_columns or name in dict(sort):
+            raise APIException('No se puede ordenar por %s' % item, status_code=400)
+        sort.append((name, item.startswith('-')))
+    # id desempata (en el sentido de la ultima columna) para que el orden sea
+    # total y el cursor no saltee ni repita filas
+    if 'id' not in dict(sort):
+        sort.append(('id', sort[-1][1]))
+    return tuple(sort)
+
+def parse_filters(model, args):
+    filters = []
+    for name in model.serialize_columns:
+        values = args.getlist(name)
+        if not values:
+            continue
+        if name not in model.filter_columns:
+            raise APIException('No se puede filtrar por %s' % name, status_code=400)
+        if len(values) > MAX_FILTER_VALUES:
+            raise APIException('Hasta %d valores por filtro' % MAX_FILTER_VALUES, status_code=400)
+        python_type = getattr(model, name).type.python_type
+        try:
+            filters.append((name, [python_type(value) for value in values]))
+        except ValueError:
+            raise APIException('Filtro %s invalido' % name, status_code=400)
+    return tuple(filters)
+
+def listing_args(model, args=None):
+    if args is None:
+        args = request.args
+    return Listing(parse_fields(model, args), parse_sort(model, args), parse_filters(model, args))
+
+def list_page_args(model, args=None):
+    # limit, cursor (valores de las columnas del orden) y Listing
+    if args is None:
+        args = request.args
+    listing = listing_args(model, args)
+    limit = page_limit(args)
+    after = args.get('after')
+    if after is None:
+        return limit, None, listing
+    values = decode_cursor(after)
+    if len(values) != len(listing.sort):
+        raise APIException('Cursor invalido', status_code=400)
+    for (name, _), value in zip(listing.sort, values):
+        if not isinstance(value, getattr(model, name).type.python_type) or isinstance(value, bool):
+            raise APIException('Cursor invalido', status_code=400)
+    return limit, values, listing
+
+
+def selected_names(listing):
+    # Columnas del SELECT: las pedidas y, al final, las del orden que falten
+    # (hacen falta para el cursor pero no salen en la respuesta)
+    return listing.fields + tuple(name for name, _ in listing.sort if name not in listing.fields)
+
+def list_select(model, listing=None):
+    listing = listing or default_listing(model)
+    stmt = select(*columns(model, selected_names(listing)))
+    for name, values in listing.filters:
+        column = getattr(model, name)
+        stmt = stmt.where(column == values[0] if len(values) == 1 else column.in_(values))
+    return stmt.order_by(*[getattr(model, name).desc() if descending else getattr(model, name)
+                           for name, descending in listing.sort])
+
+def after_condition(model, sort, values):
+    # Fila siguiente a `values` en el orden `sort`:
+    #   a > :a OR (a = :a AND id > :id)
+    # con a >= :a adelante para que la base pueda usar el indice de a como rango
+    clauses = []
+    for position, (name, descending) in enumerate(sort):
+        column = getattr(model, name)
+        equal = [getattr(model, prev) == values[index] for index, (prev, _) in enumerate(sort[:position])]
+        clauses.append(and_(*equal, column < values[position] if descending else column > values[position]))
+    condition = or_(*clauses)
+    if len(sort) > 1:
+        first = getattr(model, sort[0][0])
+        condition = and_(first <= values[0] if sort[0][1] else first >= values[0], condition)
+    return condition
+
+def keyset_select(model, limit, after, listing=None):
+    # Paginacion por clave (keyset) sobre las columnas del orden, que siempre
+    # terminan en la primary key, asi una pagina profunda cuesta lo mismo que
+    # la primera. Se pide una fila de mas para saber si hay siguiente pagina.
+    listing = listing or default_listing(model)
+    stmt = list_select(model, listing)
+    if after is not None:
+        stmt = stmt.where(after_condition(model, listing.sort, after))
+    return stmt.limit(limit + 1)
+
+def finish_page(model, rows, limit, listing=None):
+    # Devuelve la pagina ya serializada (lista de dicts) y el cursor siguiente
+    listing = listing or default_listing(model)
+    names = selected_names(listing)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][names.index(name)] for name, _ in listing.sort])
+    width = len(listing.fields)
+    return to_dicts(listing.fields, [row[:width] for row in rows]), next_cursor
+
+def paginate(model):
+    limit, after, listing = list_page_args(model)
+    rows = db.session.execute(keyset_select(model, limit, after, listing)).all()
+    return finish_page(model, rows, limit, listing)
+
+def next_link(base_url, args, next_cursor):
+    # args: pares (nombre, valor); se conservan los filtros repetidos
+    args = [(name, value) for name, value in args if name != 'after']
+    args.append(('after', next_cursor))
+    return '<%s?%s>; rel="next"' % (base_url, urlencode(args))
+
+def page_response(results, next_cursor):
+    # El cuerpo sigue siendo una lista; el cursor viaja en las cabeceras
+    response = json_response(results)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = next_link(request.base_url, request.args.items(multi=True), next_cursor)
+    return response
@@ -0,0 +1,110 @@
+import os
+import time
+import bisect
+import threading
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+from models import db
+from utils import env_flag
+from sql_compat import is_memory_sqlite, timeout_connect_args, connect_statements
+
+# Limites (en segundos) del histograma de espera para obtener una conexion
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+class WaitHistogram:
+    def __init__(self, buckets=WAIT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.timeouts = 0
+        # Funciones a las que tambien se les pasa cada observacion (ej. Prometheus)
+        self.listeners = []
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+        for listener in self.listeners:
+            listener(seconds)
+
+    def snapshot(self):
+        # Cuentas acumuladas por limite superior, como los histogramas de Prometheus
+        cumulative = {}
+        total = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            cumulative[str(bound)] = total
+        return {"buckets": cumulative, "count": self.count, "sum": self.sum, "timeouts": self.timeouts}
+
+checkout_wait = WaitHistogram()
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool que mide cuanto espera cada checkout cuando el pool esta lleno
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            checkout_wait.timeouts += 1
+            raise
+        finally:
+            checkout_wait.observe(time.perf_counter() - start)
+
+
+def engine_options(uri):
+    # Opciones del engine a partir de variables de entorno
+    # SQLite en memoria usa su propio pool de una conexion (tambien con
+    # aiosqlite: sqlite+aiosqlite://)
+    if not uri:
+        return {}
+    if is_memory_sqlite(uri):
+        return {}
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(os.environ.get('DB_POOL_SIZE', 5)),
+        "max_overflow": int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        "pool_timeout": float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        "pool_recycle": int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        "pool_pre_ping": env_flag('DB_POOL_PRE_PING', 'true'),
+    }
+    connect_args = timeout_connect_args(uri, int(os.environ.get('DB_STATEMENT_TIMEOUT', 0)))
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+def _run_on_connect(statements):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+    return on_connect
+
+def setup_pool(app):
+    # DB_STATEMENT_TIMEOUT en milisegundos; lo que el driver no acepta en los
+    # argumentos de conexion se ejecuta en cada conexion nueva
+    timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT', 0))
+    with app.app_context():
+        for engine in db.engines.values():
+            statements = connect_statements(engine.dialect.name, timeout)
+            if statements:
+                event.listen(engine, 'connect', _run_on_connect(statements))
+
+def pool_stats(engine=None):
+    # Estado del pool del proceso actual (cada worker de gunicorn tiene el suyo)
+    pool = (engine or db.engine).pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    stats["checkout_wait"] = checkout_wait.snapshot()
+    return stats
@@ -0,0 +1,166 @@
+import os
+from collections import Counter, defaultdict
+import click
+from sqlalchemy import event, inspect, select, update, func, or_
+from models import db, User, Planets, Characters, Favorites
+from cache import mark_dirty
+from serializers import columns, to_dicts
+from utils import APIException
+
+# Ranking de planetas y personajes mas elegidos como favoritos. Cada fila
+# guarda su favorites_count, que se ajusta en la misma transaccion que el
+# alta o baja del favorito:
+#  - escrituras del ORM (admin, deleteFavorite): listener after_flush
+#  - escrituras de Core (queries.py): llaman a adjust_counts()
+#  - borrado de un usuario, planeta o personaje: la base borra sus favoritos
+#    (ON DELETE CASCADE) y el listener before_flush descuenta antes lo que
+#    corresponda con un GROUP BY, sin cargar los favoritos
+# `flask popularity reconcile` recalcula los contadores desde Favorites y
+# corrige cualquier diferencia.
+
+TOP_DEFAULT = 10
+TOP_MAX = int(os.environ.get('TOP_MAX', 100))
+RECONCILE_BATCH = int(os.environ.get('RECONCILE_BATCH', 10000))
+COUNTED = ((Planets, 'id_planets'), (Characters, 'id_characters'))
+
+
+def adjust_counts(session, pairs, sign):
+    # pairs: (id_planets, id_characters) de cada favorito agregado (sign=1)
+    # o borrado (sign=-1)
+    deltas = {Planets: Counter(), Characters: Counter()}
+    for planet_id, character_id in pairs:
+        if planet_id is not None:
+            deltas[Planets][planet_id] += sign
+        if character_id is not None:
+            deltas[Characters][character_id] += sign
+    for model, counter in deltas.items():
+        _apply(session, model, counter)
+
+def _apply(session, model, counter):
+    # Un UPDATE ... WHERE id IN (...) por cada delta distinto
+    by_delta = defaultdict(list)
+    for entity_id, delta in counter.items():
+        if delta:
+            by_delta[delta].append(entity_id)
+    for delta, ids in by_delta.items():
+        for start in range(0, len(ids), RECONCILE_BATCH):
+            session.execute(
+                update(model.__table__)
+                .where(model.id.in_(ids[start:start + RECONCILE_BATCH]))
+                .values(favorites_count=model.favorites_count + delta))
+
+def favorite_pairs(*criteria):
+    # (id_planets, id_characters) de los favoritos que cumplen los filtros;
+    # se consulta antes de borrarlos con Core
+    return db.session.query(Favorites.id_planets, Favorites.id_characters).filter(*criteria).all()
+
+# Columna de Favorites que apunta a cada padre
+PARENT_COLUMNS = ((User, 'id_user'), (Planets, 'id_planets'), (Characters, 'id_characters'))
+
+def release_favorites(session, criteria):
+    # Descuenta los favoritos que va a borrar la base (ON DELETE CASCADE) y
+    # marca favorites como modificada para el cache y los ETag
+    for model, column in COUNTED:
+        target = getattr(Favorites, column)
+        counts = session.query(target, func.count()).filter(*criteria, target.isnot(None)).group_by(target).all()
+        _apply(session, model, Counter({entity_id: -count for entity_id, count in counts}))
+    if session.query(Favorites.id).filter(*criteria).first() is not None:
+        mark_dirty(session, 'favorites')
+
+def _before_flush(session, flush_context, instances):
+    # Los favoritos que el ORM ya tenia cargados se borran uno por uno y los
+    # cuenta _after_flush; aca van solo los que borra la base
+    parents = []
+    for model, column in PARENT_COLUMNS:
+        ids = [obj.id for obj in session.deleted if isinstance(obj, model)]
+        if ids:
+            parents.append(getattr(Favorites, column).in_(ids))
+    if parents:
+        loaded = [obj.id for obj in session.deleted if isinstance(obj, Favorites) and obj.id is not None]
+        release_favorites(session, [or_(*parents), Favorites.id.notin_(loaded)])
+
+def _after_flush(session, flush_context):
+    added = []
+    removed = []
+    for obj in session.new:
+        if isinstance(obj, Favorites):
+            added.append((obj.id_planets, obj.id_characters))
+    for obj in session.deleted:
+        if isinstance(obj, Favorites):
+            removed.append((obj.id_planets, obj.id_characters))
+    for obj in session.dirty:
+        if not isinstance(obj, Favorites):
+            continue
+        # Cambio de planeta o personaje en un favorito existente (admin)
+        state = inspect(obj)
+        for name, position in (('id_planets', 0), ('id_characters', 1)):
+            history = state.attrs[name].history
+            for value in history.deleted:
+                removed.append((value, None) if position == 0 else (None, value))
+            for value in history.added:
+                added.append((value, None) if position == 0 else (None, value))
+    if added:
+        adjust_counts(session, added, 1)
+    if removed:
+        adjust_counts(session, removed, -1)
+
+
+def top_n(args):
+    try:
+        n = int(args.get('n', TOP_DEFAULT))
+    except ValueError:
+        n = 0
+    if n < 1:
+        raise APIException('Parametro n invalido', status_code=400)
+    return min(n, TOP_MAX)
+
+def top_favorited(model, n):
+    # Lee el indice (favorites_count, id) de atras para adelante: no agrupa Favorites
+    names = model.serialize_columns + ('favorites',)
+    rows = db.session.execute(
+        select(*columns(model), model.favorites_count)
+        .where(model.favorites_count > 0)
+        .order_by(model.favorites_count.desc(), model.id.desc())
+        .limit(n)).all()
+    return to_dicts(names, rows)
+
+
+def reconcile(batch=RECONCILE_BATCH):
+    # Recalcula los contadores por tandas de ids (una transaccion por tanda)
+    # y devuelve cuantas filas estaban mal
+    fixed = {}
+    for model, column in COUNTED:
+        fixed[model.__tablename__] = 0
+        actual = select(func.count(Favorites.id)) \
+            .where(getattr(Favorites, column) == model.id).scalar_subquery()
+        last_id = db.session.query(func.max(model.id)).scalar() or 0
+        for start in range(0, last_id, batch):
+            result = db.session.execute(
+                update(model.__table__)
+                .where(model.id > start, model.id <= start + batch, model.favorites_count != actual)
+                .values(favorites_count=actual)
+                .execution_options(synchronize_session=False))
+            fixed[model.__tablename__] += result.rowcount
+            db.session.commit()
+    if any(fixed.values()):
+        # El ranking cuelga de la version de favorites (ETag de /planets/top)
+        mark_dirty(db.session, 'favorites')
+        db.session.commit()
+    return fixed
+
+@click.group('popularity', help='Contadores de favoritos de planetas y personajes')
+def popularity_cli():
+    pass
+
+@popularity_cli.command('reconcile', help='Recalcula favorites_count desde la tabla favorites')
+@click.option('--batch', default=RECONCILE_BATCH, show_default=True)
+def reconcile_command(batch):
+    fixed = reconcile(batch)
+    click.echo(', '.join('%s: %d corregidos' % item for item in fixed.items()))
+
+
+def setup_popularity(app):
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'before_flush', _before_flush)
+        event.listen(db.session, 'after_flush', _after_flush)
+    app.cli.add_command(popularity_cli)
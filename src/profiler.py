@@ -0,0 +1,124 @@
+import os
+import re
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils import env_flag
+from logs import info_event
+
+logger = logging.getLogger('sql.profiler')
+
+# A partir de cuantas ejecuciones de la misma consulta se sospecha un N+1
+REPEAT_THRESHOLD = int(os.environ.get('SQL_PROFILER_REPEAT', 3))
+
+_local = threading.local()
+_IN_LIST = re.compile(r'\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,?)+\)')
+_SPACES = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    # Misma forma = mismo SQL salvo el largo de las listas IN (...)
+    return _IN_LIST.sub('(...)', _SPACES.sub(' ', statement).strip())
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold=REPEAT_THRESHOLD):
+        return {shape: n for shape, n in self.shapes.items() if n >= threshold}
+
+
+def _recorders():
+    if not hasattr(_local, 'recorders'):
+        _local.recorders = []
+    return _local.recorders
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _recorders():
+        conn.info.setdefault('profiler_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('profiler_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    for recorder in _recorders():
+        recorder.record(statement, elapsed)
+
+def _listen():
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+@contextmanager
+def record_queries():
+    # Cuenta las consultas ejecutadas dentro del bloque (en este thread)
+    _listen()
+    recorder = QueryRecorder()
+    _recorders().append(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorders().remove(recorder)
+
+@contextmanager
+def assert_max_queries(limit):
+    # Para tests: falla si el bloque ejecuta mas de `limit` consultas
+    #     with assert_max_queries(3):
+    #         client.get('/user/1/favorites')
+    with record_queries() as recorder:
+        yield recorder
+    if recorder.count > limit:
+        detail = '\n'.join('%dx %s' % (n, shape) for shape, n in recorder.shapes.most_common())
+        raise AssertionError('Se esperaban como maximo %d consultas y hubo %d:\n%s'
+                             % (limit, recorder.count, detail))
+
+
+def _before_request():
+    g.sql_profiler = QueryRecorder()
+    _recorders().append(g.sql_profiler)
+
+def _after_request(response):
+    recorder = g.get('sql_profiler')
+    if recorder is None:
+        return response
+    response.headers['X-DB-Queries'] = str(recorder.count)
+    response.headers['X-DB-Time'] = '%.3f' % (recorder.seconds * 1000)
+    repeated = recorder.repeated()
+    if repeated:
+        response.headers['X-DB-Repeated'] = str(len(repeated))
+    info_event(logger, 'sql_profile',
+        endpoint=request.endpoint,
+        status=response.status_code,
+        queries=recorder.count,
+        db_ms=round(recorder.seconds * 1000, 3),
+        repeated=repeated)
+    return response
+
+def _teardown_request(error):
+    recorder = g.pop('sql_profiler', None)
+    if recorder is not None and recorder in _recorders():
+        _recorders().remove(recorder)
+
+def setup_profiler(app):
+    # Solo se activa con SQL_PROFILER=1
+    if not env_flag('SQL_PROFILER', 'false'):
+        return
+    _listen()
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
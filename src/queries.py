@@ -0,0 +1,188 @@
+import os
+from models import db, User, Planets, Characters, Favorites
+from cache import mark_dirty
+from popularity import adjust_counts, favorite_pairs
+from loaders import loader
+from sql_compat import insert_ignore
+
+
+########################
+#       Favoritos      #
+########################
+
+def add_favorite(user_id, planet_id=None, character_id=None):
+    # Un solo INSERT ... SELECT: la fila solo se inserta si existen el usuario,
+    # el planeta y el personaje, y los indices unicos descartan los repetidos.
+    # Devuelve True si se creo el favorito.
+    names = ['id_user']
+    columns = [User.id]
+    joins = []
+    if planet_id is not None:
+        names.append('id_planets')
+        columns.append(Planets.id)
+        joins.append((Planets, Planets.id == planet_id))
+    if character_id is not None:
+        names.append('id_characters')
+        columns.append(Characters.id)
+        joins.append((Characters, Characters.id == character_id))
+
+    query = db.session.query(*columns).select_from(User)
+    for model, condition in joins:
+        query = query.join(model, condition)
+    select = query.filter(User.id == user_id).statement
+    result = db.session.execute(insert_ignore(Favorites.__table__, names, select))
+    if result.rowcount:
+        mark_dirty(db.session, 'favorites')
+        adjust_counts(db.session, [(planet_id, character_id)], 1)
+    return result.rowcount > 0
+
+def missing_reference(user_id, planet_id=None, character_id=None):
+    # Solo se usa cuando add_favorite no inserto nada, para explicar por que.
+    # Devuelve 'user', 'planet', 'character' o None si era un repetido.
+    # Los cargadores del pedido consultan a lo sumo una vez cada tabla.
+    for kind, model, id in (('user', User, user_id), ('planet', Planets, planet_id),
+                            ('character', Characters, character_id)):
+        if id is not None and not loader(model).exists(id):
+            return kind
+    return None
+
+def delete_favorite(user_id, planet_id=None, character_id=None):
+    # Un solo DELETE por (id_user, id_planets) o (id_user, id_characters).
+    # Devuelve la cantidad de filas borradas.
+    criteria = [Favorites.id_user == user_id]
+    if planet_id is not None:
+        criteria.append(Favorites.id_planets == planet_id)
+    if character_id is not None:
+        criteria.append(Favorites.id_characters == character_id)
+    # Se leen antes por el mismo indice: un favorito puede tener planeta y personaje
+    pairs = favorite_pairs(*criteria)
+    if not pairs:
+        return 0
+    deleted = Favorites.query.filter(*criteria).delete(synchronize_session=False)
+    if deleted:
+        mark_dirty(db.session, 'favorites')
+        adjust_counts(db.session, pairs, -1)
+    return deleted
+
+
+########################
+#   Altas masivas      #
+########################
+
+BULK_CHUNK = 500
+MAX_BULK_ITEMS = int(os.environ.get('MAX_BULK_ITEMS', 100000))
+
+
+def chunks(items, size=BULK_CHUNK):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def existing_values(column, values):
+    # Valores de la columna que ya estan en la tabla, con IN (...) por tandas
+    found = set()
+    for chunk in chunks(values):
+        found.update(value for (value,) in db.session.query(column).filter(column.in_(chunk)))
+    return found
+
+def invalid_fields(model, record, fields):
+    # Campos de texto con un valor que no es un string (una lista o un objeto
+    # rompian el IN de los repetidos) o que no entra en la columna
+    invalid = []
+    for field in fields:
+        column_type = model.__table__.c[field].type
+        value = record[field]
+        if not isinstance(value, str) or (column_type.length and len(value) > column_type.length):
+            invalid.append(field)
+    return invalid
+
+def record_error(model, record, fields):
+    # Mensaje para un elemento invalido, o None si se puede insertar
+    if not isinstance(record, dict):
+        return "Formato invalido"
+    missing = [field for field in fields if record.get(field) is None]
+    if missing:
+        return "Falta " + ", ".join(missing)
+    invalid = invalid_fields(model, record, fields)
+    if invalid:
+        return "Valor invalido en " + ", ".join(invalid)
+    return None
+
+def bulk_create(model, records, fields, unique):
+    # Alta masiva en una sola transaccion: valida, descarta repetidos (contra
+    # la tabla y dentro del mismo lote) con consultas por conjuntos, inserta con
+    # executemany y devuelve el resultado de cada elemento en el mismo orden.
+    table = model.__table__
+    results = [None] * len(records)
+    valid = []
+    for index, record in enumerate(records):
+        error = record_error(model, record, fields)
+        if error is None:
+            valid.append((index, record))
+        else:
+            results[index] = {"index": index, "status": "invalid", "msg": error}
+
+    seen = {}
+    for key in unique:
+        seen[key] = existing_values(getattr(model, key), [record[key] for index, record in valid])
+
+    rows = []
+    positions = []
+    for index, record in valid:
+        if any(record[key] in seen[key] for key in unique):
+            results[index] = {"index": index, "status": "duplicate"}
+            continue
+        for key in unique:
+            seen[key].add(record[key])
+        rows.append({field: record[field] for field in fields})
+        positions.append(index)
+
+    for chunk in chunks(rows):
+        db.session.execute(table.insert(), chunk)
+
+    # Recupera los ids generados por la primera clave unica
+    key = unique[0]
+    column = getattr(model, key)
+    ids = {}
+    for chunk in chunks([row[key] for row in rows]):
+        ids.update((value, id) for id, value in db.session.query(model.id, column).filter(column.in_(chunk)))
+    for row, index in zip(rows, positions):
+        results[index] = {"index": index, "status": "created", "id": ids.get(row[key])}
+
+    if rows:
+        mark_dirty(db.session, table.name)
+    return results
+
+
+def sync_favorites(user_id, add_planets=(), add_characters=(), remove_planets=(), remove_characters=()):
+    # Aplica altas y bajas de favoritos de un usuario sin hacer commit: un
+    # DELETE con IN por tipo y un INSERT (executemany) que ignora repetidos.
+    # Devuelve (agregados, borrados).
+    removed = 0
+    removed_pairs = []
+    for column, ids in ((Favorites.id_planets, remove_planets), (Favorites.id_characters, remove_characters)):
+        for chunk in chunks(set(ids)):
+            criteria = (Favorites.id_user == user_id, column.in_(chunk))
+            removed_pairs += favorite_pairs(*criteria)
+            removed += Favorites.query.filter(*criteria).delete(synchronize_session=False)
+
+    # Los que el usuario ya tenia no se insertan ni se cuentan
+    existing = {}
+    for column, ids in ((Favorites.id_planets, add_planets), (Favorites.id_characters, add_characters)):
+        existing[column] = set()
+        for chunk in chunks(set(ids)):
+            existing[column].update(value for (value,) in db.session.query(column)
+                                    .filter(Favorites.id_user == user_id, column.in_(chunk)))
+    planets = set(add_planets) - existing[Favorites.id_planets]
+    characters = set(add_characters) - existing[Favorites.id_characters]
+    rows = [{"id_user": user_id, "id_planets": id, "id_characters": None} for id in planets]
+    rows += [{"id_user": user_id, "id_planets": None, "id_characters": id} for id in characters]
+    added = 0
+    for chunk in chunks(rows):
+        added += db.session.execute(insert_ignore(Favorites.__table__), chunk).rowcount
+
+    if added or removed:
+        mark_dirty(db.session, 'favorites')
+        adjust_counts(db.session, [(id, None) for id in planets] + [(None, id) for id in characters], 1)
+        adjust_counts(db.session, removed_pairs, -1)
+    return added, removed
@@ -0,0 +1,160 @@
+import os
+import time
+import itertools
+import threading
+from flask import g, request, current_app, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc
+from sqlalchemy.sql.dml import UpdateBase
+
+# Lecturas en replicas (DB_REPLICAS, separadas por coma). Los GET leen de
+# una replica elegida por round-robin entre las sanas; todo lo demas va al
+# primario: otros metodos, INSERT/UPDATE/DELETE, flush del ORM, SELECT ...
+# FOR UPDATE, y cualquier lectura que venga despues de una escritura en el
+# mismo pedido. Despues de escribir, el cliente lee del primario durante
+# DB_REPLICA_STICKY segundos (cookie) para ver sus propios cambios aunque
+# la replica este atrasada.
+
+REPLICA_STICKY = float(os.environ.get('DB_REPLICA_STICKY', 5))
+# Cuanto tiempo se deja de usar una replica que dio error de conexion
+REPLICA_RETRY = float(os.environ.get('DB_REPLICA_RETRY', 30))
+STICKY_COOKIE = 'db_primary_until'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_urls(spec=None):
+    if spec is None:
+        spec = os.environ.get('DB_REPLICAS', '')
+    return [url.strip() for url in spec.split(',') if url.strip()]
+
+def replica_binds(urls, engine_options):
+    # Un bind de Flask-SQLAlchemy por replica: replica_0, replica_1, ...
+    return {'replica_%d' % i: dict(engine_options(url), url=url) for i, url in enumerate(urls)}
+
+
+class ReplicaSet:
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.down_until = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def healthy(self):
+        now = time.monotonic()
+        return [key for key in self.keys if self.down_until.get(key, 0) <= now]
+
+    def choose(self):
+        # None si no hay ninguna sana: se lee del primario
+        healthy = self.healthy()
+        if not healthy:
+            return None
+        with self._lock:
+            return healthy[next(self._counter) % len(healthy)]
+
+    def mark_down(self, key):
+        self.down_until[key] = time.monotonic() + REPLICA_RETRY
+
+    def stats(self):
+        healthy = self.healthy()
+        return {key: key in healthy for key in self.keys}
+
+
+def _is_write(session, clause):
+    if session._flushing or isinstance(clause, UpdateBase):
+        return True
+    return getattr(clause, '_for_update_arg', None) is not None
+
+def read_bind(session, clause=None):
+    # Bind de replica para esta consulta, o None para usar el primario
+    if not has_request_context():
+        return None
+    replicas = current_app.extensions.get('replicas')
+    if replicas is None or g.get('db_wrote'):
+        return None
+    if _is_write(session, clause):
+        g.db_wrote = True
+        return None
+    return request_replica(replicas)
+
+def request_replica(replicas):
+    if 'db_replica' not in g:
+        # Una sola replica por pedido, asi todas sus lecturas ven lo mismo
+        g.db_replica = replicas.choose() if wants_replica() else None
+    return g.db_replica
+
+def wants_replica():
+    return request.method in READ_METHODS and not sticky_primary()
+
+def sticky_primary():
+    # El cliente escribio hace menos de DB_REPLICA_STICKY segundos
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) >= time.time()
+    except ValueError:
+        return False
+
+def primary_scope():
+    # La URL de la base va en el origen: dos apps del mismo proceso
+    # (create_app con otra base) no comparten claves de la cache
+    return (current_app.config['SQLALCHEMY_DATABASE_URI'], None)
+
+def cache_scope():
+    # Para las claves de la cache y las versiones: la base y la replica de la
+    # que lee este pedido (None: el primario), asi una replica atrasada no
+    # llena la cache de las lecturas del primario. Se elige aca si el pedido
+    # todavia no hizo ninguna consulta. False: no usar la cache, porque el
+    # cliente acaba de escribir y tiene que ver sus cambios.
+    if not has_request_context():
+        return primary_scope()
+    replicas = current_app.extensions.get('replicas')
+    if replicas is None:
+        return primary_scope()
+    if g.get('db_wrote') or sticky_primary():
+        return False
+    return (primary_scope()[0], request_replica(replicas))
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            key = read_bind(self, clause)
+            if key is not None:
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _connection_for_bind(self, engine, execution_options=None, **kw):
+        try:
+            return super()._connection_for_bind(engine, execution_options, **kw)
+        except exc.DBAPIError:
+            # No se pudo conectar a la replica: se la marca caida y este
+            # pedido sigue en el primario en lugar de fallar
+            key = g.get('db_replica') if has_request_context() else None
+            if key is None or engine is not self._db.engines[key]:
+                raise
+            current_app.extensions['replicas'].mark_down(key)
+            g.db_replica = None
+            return super()._connection_for_bind(self._db.engines[None], execution_options, **kw)
+
+
+def _mark_down_on_error(replicas, key):
+    def handle_error(context):
+        if context.is_disconnect or context.connection is None:
+            replicas.mark_down(key)
+    return handle_error
+
+def _sticky_primary(response):
+    if g.get('db_wrote') and REPLICA_STICKY > 0:
+        response.set_cookie(STICKY_COOKIE, '%.3f' % (time.time() + REPLICA_STICKY),
+                            max_age=int(REPLICA_STICKY) or 1, httponly=True, samesite='Lax')
+    return response
+
+def setup_replicas(app):
+    keys = [key for key in app.config.get('SQLALCHEMY_BINDS', {}) if key.startswith('replica_')]
+    if not keys:
+        return
+    replicas = ReplicaSet(keys)
+    app.extensions['replicas'] = replicas
+    with app.app_context():
+        engines = app.extensions['sqlalchemy'].engines
+        for key in keys:
+            event.listen(engines[key], 'handle_error', _mark_down_on_error(replicas, key))
+    app.after_request(_sticky_primary)
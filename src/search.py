@@ -0,0 +1,185 @@
+import os
+import sys
+from sqlalchemy import DDL, event, select, or_, and_, not_, literal_column, table
+from models import db, Planets, Characters
+from sql_compat import SQLITE, POSTGRESQL, MYSQL, dialect_name, case_insensitive, contains, has_fts5
+from serializers import columns
+
+# Busqueda por nombre en personajes y planetas, en dos niveles:
+#  - prefijo: rango sobre un indice B-tree (lower(name) en SQLite/Postgres,
+#    name en MySQL, que ya compara sin distinguir mayusculas)
+#  - subcadena (q de 3 o mas caracteres): FTS5 con tokenizer trigram en
+#    SQLite, pg_trgm en Postgres y FULLTEXT con parser ngram en MySQL
+# Primero van los prefijos, ordenados por nombre (asi la coincidencia
+# exacta queda primera), y despues las subcadenas, por tipo e id. Cada
+# consulta lee a lo sumo n filas en el orden de un indice, asi el costo no
+# crece con la cantidad de coincidencias.
+
+MIN_SUBSTRING = 3
+MAX_QUERY_CHARS = int(os.environ.get('SEARCH_MAX_QUERY_CHARS', 100))
+# Hasta donde se puede paginar (offset + limit)
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', 1000))
+
+# (tipo, modelo, columnas en las que se busca, columnas que se devuelven, tabla FTS5)
+TARGETS = [
+    ('character', Characters, ('name', 'lastName'), ('id', 'name', 'lastName'), 'characters_fts'),
+    ('planet', Planets, ('name',), ('id', 'name'), 'planets_fts'),
+]
+
+
+########################
+#   Indices por motor  #
+########################
+
+def fts5_ddl(source, fts, names):
+    # Tabla FTS5 de contenido externo (no duplica los datos), sincronizada por
+    # triggers. El de UPDATE solo mira las columnas indexadas: los contadores
+    # de favoritos no reescriben los trigramas.
+    cols = ', '.join('"%s"' % name for name in names)
+    new = ', '.join('new."%s"' % name for name in names)
+    old = ', '.join('old."%s"' % name for name in names)
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{source}', "
+        "content_rowid='id', tokenize='trigram')",
+        "CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} BEGIN "
+        "INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        "CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source} BEGIN "
+        "INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        "CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {source} BEGIN "
+        "INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        "INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+    ]
+    return [s.format(fts=fts, source=source, cols=cols, new=new, old=old) for s in statements]
+
+SEARCH_DDL = {
+    'planets': {
+        SQLITE: ['CREATE INDEX IF NOT EXISTS ix_planets_name_lower ON planets (lower(name))']
+                + fts5_ddl('planets', 'planets_fts', ['name']),
+        POSTGRESQL: [
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+            'CREATE INDEX IF NOT EXISTS ix_planets_name_lower ON planets (lower(name))',
+            'CREATE INDEX IF NOT EXISTS ix_planets_name_trgm ON planets USING gin (lower(name) gin_trgm_ops)',
+        ],
+        MYSQL: ['CREATE FULLTEXT INDEX ix_planets_name_ft ON planets (name) WITH PARSER ngram'],
+    },
+    'characters': {
+        SQLITE: [
+            'CREATE INDEX IF NOT EXISTS ix_characters_name_lower ON characters (lower(name))',
+            'CREATE INDEX IF NOT EXISTS ix_characters_lastname_lower ON characters (lower("lastName"))',
+        ] + fts5_ddl('characters', 'characters_fts', ['name', 'lastName']),
+        POSTGRESQL: [
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+            'CREATE INDEX IF NOT EXISTS ix_characters_name_lower ON characters (lower(name))',
+            'CREATE INDEX IF NOT EXISTS ix_characters_lastname_lower ON characters (lower("lastName"))',
+            'CREATE INDEX IF NOT EXISTS ix_characters_name_trgm ON characters USING gin (lower(name) gin_trgm_ops)',
+            'CREATE INDEX IF NOT EXISTS ix_characters_lastname_trgm ON characters '
+            'USING gin (lower("lastName") gin_trgm_ops)',
+        ],
+        MYSQL: ['CREATE FULLTEXT INDEX ix_characters_name_ft ON characters (name, lastName) WITH PARSER ngram'],
+    },
+}
+
+# create_all() (tests, benchmarks) crea lo mismo que la migracion
+for _model in (Planets, Characters):
+    for _dialect, _statements in SEARCH_DDL[_model.__tablename__].items():
+        for _statement in _statements:
+            event.listen(_model.__table__, 'after_create', DDL(_statement).execute_if(dialect=_dialect))
+    # La tabla FTS5 no depende de la tabla de origen: drop_all() la tiene que borrar aparte
+    event.listen(_model.__table__, 'after_drop',
+                 DDL('DROP TABLE IF EXISTS %s_fts' % _model.__tablename__).execute_if(dialect=SQLITE))
+
+
+def suspend_search_sync(connection, model):
+    # Para cargas masivas en SQLite: sin los triggers FTS5 cada INSERT no
+    # indexa sus trigramas; resume_search_sync reconstruye el indice de una vez
+    if not has_fts5(connection.dialect.name):
+        return False
+    for suffix in ('ai', 'ad', 'au'):
+        connection.exec_driver_sql('DROP TRIGGER IF EXISTS %s_fts_%s' % (model.__tablename__, suffix))
+    return True
+
+def resume_search_sync(connection, model):
+    fts = '%s_fts' % model.__tablename__
+    for statement in SEARCH_DDL[model.__tablename__][SQLITE]:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql("INSERT INTO %s(%s) VALUES ('rebuild')" % (fts, fts))
+
+########################
+#       Consultas      #
+########################
+
+def prefix_match(key, q):
+    # key >= 'tat' AND key < 'tau': usa el indice, a diferencia de LIKE 'tat%'
+    # sobre lower(...). U+10FFFF no tiene siguiente: el limite sale del ultimo
+    # caracter anterior, y si no hay ninguno no hay limite.
+    stem = q.rstrip(chr(sys.maxunicode))
+    if not stem:
+        return key >= q
+    return and_(key >= q, key < stem[:-1] + chr(ord(stem[-1]) + 1))
+
+def prefix_rows(model, keys, returned, q, n):
+    # Una consulta por columna, cada una en el orden de su indice, asi cada
+    # una se corta en n filas sin ordenar todas las coincidencias. Si la fila
+    # empieza con q en mas de una columna queda la menor de sus claves: las
+    # n primeras de la union siempre estan entre las n primeras de alguna
+    # de las consultas.
+    best = {}
+    for key in keys:
+        stmt = select(key, *columns(model, returned)).where(prefix_match(key, q)) \
+            .order_by(key, model.id).limit(n)
+        for row in db.session.execute(stmt):
+            sort_key = row[0].lower()
+            entity_id = row[1]
+            if entity_id not in best or sort_key < best[entity_id][0]:
+                best[entity_id] = (sort_key, tuple(row[1:]))
+    return sorted(best.values(), key=lambda item: (item[0], item[1][0]))[:n]
+
+def substring_rows(model, searched, returned, fts, prefixes, q, n, dialect):
+    # Las subcadenas van por id: ordenar por nombre obligaba a leer y ordenar
+    # todas las coincidencias (una q comun matchea media tabla)
+    stmt = select(*columns(model, returned)).where(not_(or_(*prefixes))).limit(n)
+    if has_fts5(dialect):
+        # Recorre la tabla FTS5 en orden de rowid y para en la fila n
+        rowid = literal_column('%s.rowid' % fts)
+        phrase = '"%s"' % q.replace('"', '""')
+        stmt = stmt.select_from(table(fts)).join(model, model.id == rowid) \
+            .where(literal_column(fts).op('MATCH')(phrase)).order_by(rowid)
+    else:
+        # pg_trgm en Postgres, FULLTEXT ngram en MySQL
+        stmt = stmt.where(contains(columns(model, searched), q, dialect)).order_by(model.id)
+    return [tuple(row) for row in db.session.execute(stmt)]
+
+def search_model(kind, model, searched, returned, fts, q, n, dialect):
+    # Devuelve hasta n filas del modelo como (nivel, clave de orden, tipo, fila)
+    keys = [case_insensitive(column, dialect) for column in columns(model, searched)]
+    found = [(0, key, kind, row) for key, row in prefix_rows(model, keys, returned, q, n)]
+
+    # Si los prefijos ya llenan n filas, ninguna subcadena de este modelo entra
+    if len(q) >= MIN_SUBSTRING and len(found) < n:
+        prefixes = [prefix_match(key, q) for key in keys]
+        rows = substring_rows(model, searched, returned, fts, prefixes, q, n - len(found), dialect)
+        found += [(1, '', kind, row) for row in rows]
+    return found
+
+def search(q, limit, offset=0):
+    # Resultados rankeados [offset, offset + limit) y si hay mas despues
+    q = q.strip().lower()
+    limit = min(limit, SEARCH_MAX_RESULTS - offset)
+    if limit <= 0:
+        return [], False
+
+    dialect = dialect_name()
+    n = offset + limit + 1
+    found = []
+    for kind, model, searched, returned, fts in TARGETS:
+        found += [(level, key, kind, row, returned)
+                  for level, key, kind, row in search_model(kind, model, searched, returned, fts, q, n, dialect)]
+    found.sort(key=lambda item: (item[0], item[1], item[2], item[3][0]))
+
+    results = []
+    for level, key, kind, row, returned in found[offset:offset + limit]:
+        item = {"type": kind, "match": "prefix" if level == 0 else "substring"}
+        item.update(zip(returned, row))
+        results.append(item)
+    has_more = len(found) > offset + limit and offset + limit < SEARCH_MAX_RESULTS
+    return results, has_more
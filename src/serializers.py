@@ -0,0 +1,34 @@
+import json
+from flask import Response
+from models import db
+
+# orjson es opcional: si esta instalado se usa para codificar las respuestas
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def columns(model, names=None):
+    return [getattr(model, name) for name in (names or model.serialize_columns)]
+
+def project(model, names=None):
+    # Consulta solo las columnas exportadas: devuelve tuplas, sin crear
+    # objetos del ORM ni pasar por el identity map
+    return db.session.query(*columns(model, names))
+
+def to_dicts(names, rows):
+    return [dict(zip(names, row)) for row in rows]
+
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_response(obj, status=200):
+    return Response(dumps(obj), status=status, mimetype='application/json')
@@ -0,0 +1,124 @@
+from sqlalchemy import func, or_, text
+from sqlalchemy.dialects import mysql, postgresql
+from sqlalchemy.engine import make_url
+from models import db
+
+# Todo lo que cambia entre MySQL, Postgres y SQLite queda aca: el resto del
+# codigo pide la variante que necesita en lugar de mirar dialect.name.
+
+MYSQL = 'mysql'
+POSTGRESQL = 'postgresql'
+SQLITE = 'sqlite'
+
+# Driver async de cada motor (para asgi.py)
+ASYNC_DRIVERS = {
+    SQLITE: 'sqlite+aiosqlite',
+    MYSQL: 'mysql+aiomysql',
+    POSTGRESQL: 'postgresql+asyncpg',
+}
+
+
+def dialect_name(bind=None):
+    # Motor de la sesion actual, o del engine/conexion que se pase
+    return (bind if bind is not None else db.session.get_bind()).dialect.name
+
+
+########################
+#      Conexiones      #
+########################
+
+def is_memory_sqlite(uri):
+    # sqlite://, sqlite:///:memory: y sqlite+aiosqlite:// usan su propio pool
+    url = make_url(uri)
+    return url.get_backend_name() == SQLITE and url.database in (None, '', ':memory:')
+
+def async_url(url):
+    # mysql+mysqlconnector://... -> mysql+aiomysql://...
+    scheme, rest = url.split('://', 1)
+    backend = scheme.split('+', 1)[0]
+    return '%s://%s' % (ASYNC_DRIVERS.get(backend, scheme), rest)
+
+def timeout_connect_args(uri, timeout):
+    # DB_STATEMENT_TIMEOUT (ms) en los argumentos de conexion, donde el driver
+    # lo permite; MySQL sync lo aplica con connect_statements
+    if not timeout:
+        return {}
+    url = make_url(uri)
+    backend, driver = url.get_backend_name(), url.get_driver_name()
+    if backend == POSTGRESQL and driver == 'asyncpg':
+        return {'server_settings': {'statement_timeout': str(timeout)}}
+    if backend == POSTGRESQL:
+        return {'options': '-c statement_timeout=%d' % timeout}
+    if backend == MYSQL and driver == 'aiomysql':
+        return {'init_command': 'SET SESSION max_execution_time = %d' % timeout}
+    return {}
+
+def connect_statements(dialect, timeout):
+    # Lo que se ejecuta en cada conexion nueva de un engine sync
+    if dialect == SQLITE:
+        # SQLite ignora las FOREIGN KEY (y ON DELETE CASCADE) si no se
+        # activan en cada conexion
+        return ['PRAGMA foreign_keys = ON']
+    if dialect == MYSQL and timeout:
+        return ['SET SESSION max_execution_time = %d' % timeout]
+    return []
+
+
+########################
+#       Consultas      #
+########################
+
+def insert_ignore(table, names=None, select=None):
+    # INSERT que ignora los conflictos de unicidad en lugar de fallar:
+    # INSERT IGNORE (MySQL), INSERT OR IGNORE (SQLite), ON CONFLICT DO NOTHING (Postgres)
+    dialect = dialect_name()
+    if dialect == POSTGRESQL:
+        stmt = postgresql.insert(table)
+    else:
+        stmt = table.insert()
+    if select is not None:
+        stmt = stmt.from_select(names, select)
+    if dialect == POSTGRESQL:
+        return stmt.on_conflict_do_nothing()
+    if dialect == SQLITE:
+        return stmt.prefix_with('OR IGNORE')
+    return stmt.prefix_with('IGNORE')
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def case_insensitive(column, dialect):
+    # MySQL ya compara sin distinguir mayusculas; los demas usan lower(...)
+    return column if dialect == MYSQL else func.lower(column)
+
+def has_fts5(dialect):
+    # Solo SQLite busca subcadenas en una tabla FTS5 aparte
+    return dialect == SQLITE
+
+def contains(columns, q, dialect):
+    # Subcadena en alguna de las columnas: FULLTEXT ngram en MySQL, LIKE sobre
+    # lower(...) (con pg_trgm en Postgres) en los demas
+    if dialect == MYSQL:
+        phrase = '"%s"' % q.replace('"', ' ')
+        return mysql.match(*columns, against=phrase).in_boolean_mode()
+    pattern = '%' + escape_like(q) + '%'
+    return or_(*(func.lower(column).like(pattern, escape='\\') for column in columns))
+
+
+########################
+#    Cargas masivas    #
+########################
+
+def droppable_indexes(indexes, dialect):
+    # MySQL no deja borrar el indice que usa una clave foranea
+    if dialect == MYSQL:
+        return [index for index in indexes if not list(index.columns)[0].foreign_keys]
+    return indexes
+
+def sequence_reset(table, dialect):
+    # Las filas vienen con id: en Postgres la secuencia tiene que seguir desde
+    # el maximo. Devuelve la sentencia, o None si el motor no la necesita.
+    if dialect != POSTGRESQL:
+        return None
+    return text("SELECT setval(pg_get_serial_sequence('\"%s\"', 'id'), COALESCE(MAX(id), 0) + 1, false) "
+                "FROM \"%s\"" % (table, table))
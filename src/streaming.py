@@ -0,0 +1,55 @@
+import os
+from flask import request, Response, stream_with_context
+from models import db
+from serializers import dumps
+from pagination import listing_args, list_select
+
+NDJSON = 'application/x-ndjson'
+STREAM_BATCH = int(os.environ.get('STREAM_BATCH', 1000))
+
+
+def wants_stream():
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON])
+    return best == NDJSON
+
+def iter_rows(model, listing=None):
+    # yield_per usa un cursor del lado del servidor: nunca hay mas de
+    # STREAM_BATCH filas en memoria. Respeta ?fields=, ?sort= y los filtros.
+    stmt = list_select(model, listing).execution_options(yield_per=STREAM_BATCH)
+    names = listing.fields if listing else model.serialize_columns
+    width = len(names)
+    for row in db.session.execute(stmt):
+        yield dict(zip(names, row[:width]))
+
+def iter_chunks(lines):
+    # Agrupa las lineas para no hacer un write por fila
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= STREAM_BATCH:
+            yield b''.join(chunk)
+            chunk = []
+    if chunk:
+        yield b''.join(chunk)
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield dumps(row) + b'\n'
+
+def json_array_lines(rows):
+    yield b'['
+    separator = b''
+    for row in rows:
+        yield separator + dumps(row)
+        separator = b','
+    yield b']'
+
+def stream_response(model, listing=None):
+    rows = iter_rows(model, listing if listing is not None else listing_args(model))
+    if request.accept_mimetypes.best_match(['application/json', NDJSON]) == NDJSON:
+        body, mimetype = ndjson_lines(rows), NDJSON
+    else:
+        body, mimetype = json_array_lines(rows), 'application/json'
+    return Response(stream_with_context(iter_chunks(body)), mimetype=mimetype)
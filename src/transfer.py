@@ -0,0 +1,281 @@
+import os
+import io
+import csv
+import hmac
+import time
+import itertools
+import click
+from flask import request, Response, stream_with_context
+from sqlalchemy import select, exc
+from models import db, User, Planets, Characters, Favorites
+from serializers import dumps, loads
+from streaming import STREAM_BATCH, iter_chunks
+from cache import mark_dirty
+from popularity import reconcile
+from search import TARGETS, suspend_search_sync, resume_search_sync
+from sql_compat import dialect_name, droppable_indexes, sequence_reset
+from utils import APIException
+
+# Exportacion e importacion de las cuatro tablas para pasar datos de un
+# entorno a otro:
+#  - GET /export y `flask data export` escriben NDJSON o CSV leyendo cada
+#    tabla con un cursor del lado del servidor (memoria constante)
+#  - `flask data import` carga ese archivo en tandas de IMPORT_BATCH filas,
+#    una transaccion por tanda, con los padres antes que los hijos
+# El archivo trae las contrasenias: GET /export solo responde si se manda
+# el token de EXPORT_TOKEN (Authorization: Bearer ...).
+#
+# NDJSON: una linea por fila, {"table": "planets", "row": {"id": 1, ...}}
+# CSV: cada tabla empieza con su cabecera (table,id,name,...) y cada fila
+# lleva el nombre de la tabla en la primera columna.
+
+EXPORT_TOKEN = os.environ.get('EXPORT_TOKEN', '')
+IMPORT_BATCH = int(os.environ.get('IMPORT_BATCH', 10000))
+# Orden de las claves foraneas: cada tabla despues de las que referencia
+TABLES = (User, Planets, Characters, Favorites)
+# Columnas que no se exportan: se recalculan al importar
+DERIVED = ('favorites_count',)
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def table_columns(model):
+    return [column for column in model.__table__.columns if column.name not in DERIVED]
+
+def column_names(model):
+    return [column.name for column in table_columns(model)]
+
+def models_for(names=None):
+    if not names:
+        return TABLES
+    known = {model.__tablename__: model for model in TABLES}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise APIException('Tablas invalidas: %s' % ', '.join(unknown), status_code=400)
+    return tuple(model for model in TABLES if model.__tablename__ in names)
+
+
+########################
+#      Exportacion     #
+########################
+
+def iter_table(model):
+    # yield_per: cursor del lado del servidor, STREAM_BATCH filas por vez
+    stmt = select(*table_columns(model)).order_by(model.id).execution_options(yield_per=STREAM_BATCH)
+    return db.session.execute(stmt)
+
+def ndjson_export(models):
+    for model in models:
+        names = column_names(model)
+        prefix = b'{"table":' + dumps(model.__tablename__) + b',"row":'
+        for row in iter_table(model):
+            yield prefix + dumps(dict(zip(names, row))) + b'}\n'
+
+def csv_export(models):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for model in models:
+        name = model.__tablename__
+        writer.writerow(['table'] + column_names(model))
+        rows = iter(iter_table(model))
+        while True:
+            batch = list(itertools.islice(rows, STREAM_BATCH))
+            if not batch:
+                break
+            writer.writerows((name,) + tuple(row) for row in batch)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def export_lines(fmt, models):
+    return csv_export(models) if fmt == 'csv' else iter_chunks(ndjson_export(models))
+
+def check_export_token():
+    # Sin EXPORT_TOKEN configurado el endpoint no existe
+    if not EXPORT_TOKEN:
+        raise APIException('Exportacion deshabilitada', status_code=404)
+    header = request.headers.get('Authorization', '')
+    token = header[7:] if header.startswith('Bearer ') else ''
+    if not hmac.compare_digest(token.encode(), EXPORT_TOKEN.encode()):
+        raise APIException('Token invalido', status_code=401)
+
+def export_response():
+    check_export_token()
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        raise APIException('Formato invalido: ndjson o csv', status_code=400)
+    tables = request.args.get('tables')
+    models = models_for(tables.split(',') if tables else None)
+    response = Response(stream_with_context(export_lines(fmt, models)), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = 'attachment; filename=export.%s' % fmt
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+########################
+#      Importacion     #
+########################
+
+def read_ndjson(path, skip=()):
+    # skip: prefijos de las lineas de otras tablas (tal como las escribe
+    # export), que se saltean sin decodificar el JSON
+    skip = tuple(skip)
+    with open(path, 'rb') as file:
+        for number, line in enumerate(file, 1):
+            if line.startswith(skip) or not line.strip():
+                continue
+            try:
+                record = loads(line)
+                yield number, record['table'], record['row']
+            except (ValueError, KeyError, TypeError):
+                raise click.ClickException('Linea %d invalida' % number)
+
+def read_csv(path):
+    header = None
+    with open(path, newline='', encoding='utf-8') as file:
+        for number, row in enumerate(csv.reader(file), 1):
+            if not row:
+                continue
+            if row[0] == 'table':
+                header = row[1:]
+                continue
+            if header is None or len(row) != len(header) + 1:
+                raise click.ClickException('Linea %d invalida' % number)
+            yield number, row[0], dict(zip(header, row[1:]))
+
+def csv_converters(model):
+    # CSV trae todo como texto: '' es NULL en las columnas que lo admiten
+    converters = {}
+    for column in table_columns(model):
+        python_type = column.type.python_type
+        def convert(value, python_type=python_type, nullable=column.nullable):
+            if value == '' and nullable:
+                return None
+            return python_type(value)
+        converters[column.name] = convert
+    return converters
+
+def table_rows(path, fmt, model):
+    # Filas de una sola tabla, validadas y con los tipos de las columnas
+    names = set(column_names(model))
+    known = {other.__tablename__ for other in TABLES}
+    converters = None
+    if fmt == 'csv':
+        records = read_csv(path)
+        converters = csv_converters(model)
+    else:
+        records = read_ndjson(path, [b'{"table":' + dumps(name) + b',' for name in known
+                                     if name != model.__tablename__])
+    for number, table, row in records:
+        if table not in known:
+            raise click.ClickException('Linea %d: tabla desconocida %s' % (number, table))
+        if table != model.__tablename__:
+            continue
+        if not isinstance(row, dict) or set(row) != names:
+            raise click.ClickException('Linea %d: se esperaban las columnas %s' % (number, ', '.join(sorted(names))))
+        if converters is not None:
+            try:
+                row = {name: converters[name](value) for name, value in row.items()}
+            except ValueError:
+                raise click.ClickException('Linea %d: valor invalido' % number)
+        yield row
+
+def deferred_indexes(model, dialect):
+    # Solo los no unicos: los unicos siguen evitando repetidos durante la carga
+    return droppable_indexes([index for index in model.__table__.indexes if not index.unique], dialect)
+
+def reset_sequence(model, dialect):
+    # Las filas vienen con id: la secuencia (si el motor tiene) sigue desde el maximo
+    statement = sequence_reset(model.__tablename__, dialect)
+    if statement is not None:
+        db.session.execute(statement)
+
+def import_table(path, fmt, model, batch, defer_indexes):
+    dialect = dialect_name()
+    indexes = deferred_indexes(model, dialect) if defer_indexes else []
+    for index in indexes:
+        index.drop(db.session.connection())
+    searched = defer_indexes and model in [target[1] for target in TARGETS] \
+        and suspend_search_sync(db.session.connection(), model)
+    db.session.commit()
+
+    insert = model.__table__.insert()
+    rows = table_rows(path, fmt, model)
+    count = 0
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, batch))
+            if not chunk:
+                break
+            # Una transaccion por tanda, con executemany
+            db.session.execute(insert, chunk)
+            db.session.commit()
+            count += len(chunk)
+    except exc.IntegrityError as error:
+        raise click.ClickException('%s: fila repetida o referencia inexistente despues de %d filas (%s)'
+                                   % (model.__tablename__, count, error.orig))
+    finally:
+        # Los indices se recrean aunque la carga falle a mitad de camino
+        db.session.rollback()
+        for index in indexes:
+            index.create(db.session.connection())
+        if searched:
+            resume_search_sync(db.session.connection(), model)
+        if count:
+            reset_sequence(model, dialect)
+            mark_dirty(db.session, model.__tablename__)
+        db.session.commit()
+    return count
+
+def import_file(path, fmt, batch=IMPORT_BATCH, defer_indexes=False):
+    # Devuelve {tabla: filas importadas}. Lee el archivo una vez por tabla,
+    # en el orden de TABLES, asi el orden de las lineas no importa.
+    counts = {}
+    for model in TABLES:
+        counts[model.__tablename__] = import_table(path, fmt, model, batch, defer_indexes)
+    if any(counts[model.__tablename__] for model in (Planets, Characters, Favorites)):
+        # favorites_count no viaja en el archivo
+        reconcile()
+    return counts
+
+
+def detect_format(path, fmt):
+    if fmt:
+        return fmt
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+@click.group('data', help='Exporta e importa usuarios, planetas, personajes y favoritos')
+def data_cli():
+    pass
+
+@data_cli.command('export', help='Escribe las tablas en un archivo NDJSON o CSV')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), help='Por defecto, segun la extension')
+@click.option('--tables', help='Tablas separadas por coma (por defecto, todas)')
+def export_command(path, fmt, tables):
+    fmt = detect_format(path, fmt)
+    try:
+        models = models_for(tables.split(',') if tables else None)
+    except APIException as error:
+        raise click.ClickException(error.message)
+    with open(path, 'wb') as file:
+        for chunk in export_lines(fmt, models):
+            file.write(chunk)
+
+@data_cli.command('import', help='Carga un archivo generado por export en la base')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), help='Por defecto, segun la extension')
+@click.option('--batch', default=IMPORT_BATCH, show_default=True, help='Filas por transaccion')
+@click.option('--defer-indexes', is_flag=True, help='Borra los indices no unicos y los recrea al final de cada tabla')
+def import_command(path, fmt, batch, defer_indexes):
+    start = time.perf_counter()
+    counts = import_file(path, detect_format(path, fmt), batch, defer_indexes)
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    click.echo(', '.join('%s: %d' % item for item in counts.items()))
+    click.echo('%d filas en %.1f s (%d filas/min)' % (total, elapsed, total / elapsed * 60 if elapsed else 0))
+
+
+def setup_transfer(app):
+    app.cli.add_command(data_cli)
@@ -1,3 +1,4 @@
+import os
 from flask import jsonify, url_for
 
 class APIException(Exception):
@@ -15,13 +16,20 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+def is_id(value):
+    # bool es subclase de int: true/false no son ids
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def env_flag(name, default):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes', 'on')
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
     return len(defaults) >= len(arguments)
 
 def generate_sitemap(app):
-    links = ['/admin/']
+    links = ['/admin/'] if 'admin' in app.extensions else []
     for rule in app.url_map.iter_rules():
         # Filter out rules we can't navigate to in a browser
         # and rules that require parameters
@@ -0,0 +1,176 @@
+import os
+import time
+import hashlib
+import threading
+import logging
+from functools import wraps
+from flask import request, make_response, g, has_request_context
+from sqlalchemy import exc
+from models import db, TableVersion
+from compression import negotiate
+from serializers import dumps, json_response
+from replicas import cache_scope, primary_scope
+
+logger = logging.getLogger('api.versions')
+
+VERSIONED_TABLES = ('user', 'planets', 'characters', 'favorites')
+# Cuanto se usa una version leida de la base sin volver a consultarla. Los
+# commits de este proceso la olvidan enseguida; los de otros procesos se
+# ven a lo sumo VERSION_TTL segundos despues.
+VERSION_TTL = float(os.environ.get('VERSION_TTL', 1))
+
+# Versiones que leyo el proceso: {(origen, tabla): (version, cuando)}. El
+# origen es la base y la replica de la que se leyo (ver cache_scope).
+_known = {}
+# Cuantas veces se olvidaron versiones: una lectura que empezo antes de un
+# commit no guarda lo que leyo
+_forgotten = 0
+_lock = threading.Lock()
+
+
+def bump_version(session, table):
+    # Solo anota la tabla: la version se sube despues del commit, en una
+    # transaccion propia y corta (publish_versions). Dentro de la transaccion
+    # que escribe, el UPDATE de la fila de la version la dejaba bloqueada
+    # hasta el commit y todas las escrituras a la tabla se hacian en fila.
+    if table in VERSIONED_TABLES:
+        session.info.setdefault('bumped_versions', set()).add(table)
+
+def clear_bumped(session):
+    session.info.pop('bumped_versions', None)
+
+def commit_bumped(session):
+    # after_commit: las tablas escritas esperan a que termine la transaccion
+    tables = session.info.pop('bumped_versions', None)
+    if tables:
+        session.info.setdefault('committed_versions', set()).update(tables)
+
+def _increment(connection, table):
+    versions = TableVersion.__table__
+    result = connection.execute(
+        versions.update()
+        .where(versions.c.name == table)
+        .values(version=versions.c.version + 1))
+    if result.rowcount == 0:
+        connection.execute(versions.insert().values(name=table, version=1))
+
+def publish_versions(session):
+    # Al terminar la transaccion, con su conexion ya devuelta al pool. Entre
+    # el commit y este UPDATE una lectura puede guardar en la cache datos
+    # nuevos bajo la version vieja, que despues nadie vuelve a pedir.
+    tables = session.info.pop('committed_versions', None)
+    if not tables:
+        return
+    for attempt in range(2):
+        try:
+            with db.engine.begin() as connection:
+                for table in sorted(tables):
+                    _increment(connection, table)
+            break
+        except exc.IntegrityError:
+            # Otro proceso creo la fila de la version a la vez: se repite el UPDATE
+            continue
+        except exc.SQLAlchemyError:
+            # Los datos ya estan guardados: la cache vieja dura a lo sumo CACHE_TTL
+            logger.exception('No se pudo subir la version de %s', ', '.join(sorted(tables)))
+            break
+    forget_versions(tables)
+
+def forget_versions(tables=None):
+    # Despues de un commit de este proceso: la proxima lectura va a la base
+    global _forgotten
+    with _lock:
+        _forgotten += 1
+        for key in list(_known):
+            if tables is None or key[1] in tables:
+                del _known[key]
+    if tables is not None and has_request_context():
+        for table in tables:
+            g.get('table_versions', {}).pop(table, None)
+
+def current_versions(tables):
+    # Lo leido queda en g: la cache arma sus claves con estas mismas
+    # versiones. Solo se consulta la base por las que el proceso no leyo en
+    # los ultimos VERSION_TTL segundos, asi un acierto de la cache no hace
+    # ninguna consulta.
+    known = g.setdefault('table_versions', {})
+    pending = [table for table in tables if table not in known]
+    if pending:
+        source = cache_scope()
+        now = time.monotonic()
+        stale = []
+        for table in pending:
+            version, read_at = _known.get((source, table), (0, None))
+            if source is False or read_at is None or now - read_at >= VERSION_TTL:
+                stale.append(table)
+            else:
+                known[table] = version
+        if stale:
+            forgotten = _forgotten
+            rows = db.session.query(TableVersion.name, TableVersion.version).filter(TableVersion.name.in_(stale))
+            versions = dict(rows)
+            with _lock:
+                for table in stale:
+                    known[table] = versions.get(table, 0)
+                    if forgotten == _forgotten:
+                        # False: el cliente acaba de escribir y lee del primario
+                        _known[(primary_scope() if source is False else source, table)] = (known[table], now)
+    return [known[table] for table in tables]
+
+def table_version(table):
+    return current_versions((table,))[0]
+
+def format_etag(tables, versions, variant):
+    # El ETag depende de la version de las tablas y de la representacion pedida
+    # (ruta, query string y formato), nunca del contenido serializado.
+    digest = hashlib.sha1(variant.encode()).hexdigest()[:16]
+    return '%s-%s-%s' % (tables[0], '.'.join(str(version) for version in versions), digest)
+
+def representation(path, query, accept, accept_encoding):
+    # Lo que distingue una representacion de otra: ruta, query string, formato
+    # pedido y codificacion negociada (gzip/br es otra representacion, otro
+    # ETag). asgi.py la arma con los mismos datos, asi los dos puntos de
+    # entrada dan el mismo ETag.
+    return '%s?%s|%s|%s' % (path, query, accept, negotiate(accept_encoding))
+
+def request_variant():
+    return representation(request.path, request.query_string.decode('latin-1'),
+                          request.headers.get('Accept', ''), request.headers.get('Accept-Encoding'))
+
+def make_etag(tables):
+    return format_etag(tables, current_versions(tables), request_variant())
+
+def entity_etag(table, entity, variant):
+    # El ETag de una fila sale de sus datos: una escritura en otra fila de la
+    # tabla no lo cambia
+    digest = hashlib.sha1(variant.encode() + b'|' + dumps(entity)).hexdigest()[:16]
+    return '%s-%s' % (table, digest)
+
+def entity_response(table, entity):
+    # GET condicional de una fila ya cargada (en general, de la cache)
+    etag = entity_etag(table, entity, request_variant())
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = json_response(entity)
+    response.set_etag(etag)
+    return response
+
+def conditional(*tables):
+    # GET condicional: con If-None-Match igual al ETag actual devuelve 304
+    # sin ejecutar la consulta ni serializar nada. Se pasan todas las tablas
+    # de las que depende la respuesta.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = make_etag(tables)
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                return response
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
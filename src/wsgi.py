@@ -1,7 +1,10 @@
 # This file was created to run the application on heroku using gunicorn.
 # Read more about it here: https://devcenter.heroku.com/articles/python-gunicorn
 
-from main import app as application
+from main import create_app
+
+# El servidor no necesita los comandos de `flask db`
+application = create_app({"MIGRATE_ENABLED": False})
 
 if __name__ == "__main__":
     application.run()
@@ -0,0 +1,72 @@
+"""
+Tests de la API sobre una SQLite temporal por test:
+
+    pipenv run test
+    python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+# Los modulos de la app se importan como en src/ (from models import db, ...)
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+# Varios modulos leen el entorno al importarse: se fija antes de importarlos
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ['DB_REPLICAS'] = ''
+os.environ['SQL_PROFILER'] = 'false'
+# asgi.py arma su app por defecto al importarse
+os.environ.setdefault('DB_CONNECTION_STRING', 'sqlite://')
+
+from main import create_app  # noqa: E402
+from models import db, User, Planets, Characters  # noqa: E402
+import cache  # noqa: E402
+import versions  # noqa: E402
+
+CONFIG = {"ADMIN_ENABLED": False, "METRICS_ENABLED": False, "MIGRATE_ENABLED": False, "ADMISSION_ENABLED": False}
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    return 'sqlite:///%s' % (tmp_path / 'test.db')
+
+@pytest.fixture
+def make_app(db_url):
+    # create_app con las tablas creadas y la cache vacia (la cache y las
+    # versiones son del proceso, y las de una base nueva vuelven a empezar en 0)
+    def make(**config):
+        app = create_app(dict(CONFIG, SQLALCHEMY_DATABASE_URI=db_url, **config))
+        with app.app_context():
+            db.create_all(bind_key=None)
+        cache.backend.clear()
+        versions.forget_versions()
+        return app
+    return make
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def seed(app):
+    # seed(users=2, planets=3, characters=3): filas con nombres previsibles
+    def seed(users=0, planets=0, characters=0):
+        with app.app_context():
+            if users:
+                db.session.execute(db.insert(User), [
+                    {"name": "Nombre %d" % i, "lastname": "Apellido %d" % i, "username": "usuario%d" % i,
+                     "email": "usuario%d@example.com" % i, "password": "x"} for i in range(1, users + 1)])
+            if planets:
+                db.session.execute(db.insert(Planets), [{"name": "Planeta %d" % i} for i in range(1, planets + 1)])
+            if characters:
+                db.session.execute(db.insert(Characters), [
+                    {"name": "Nombre %d" % i, "lastName": "Apellido %d" % i} for i in range(1, characters + 1)])
+            db.session.commit()
+    return seed
@@ -0,0 +1,92 @@
+import time
+import threading
+
+import pytest
+from admission import Admission, TokenBuckets, queue_delay, client_key
+
+
+# buffered=True: el cliente de test cierra la respuesta (como el servidor),
+# que es cuando se libera el lugar del pedido
+
+@pytest.fixture
+def limited(make_app):
+    # Bucket chico para que se agote en pocos pedidos
+    def limited(rate=1, burst=2):
+        app = make_app(ADMISSION_ENABLED=True)
+        app.extensions['admission'] = Admission(buckets=TokenBuckets(rate=rate, burst=burst))
+        return app
+    return limited
+
+
+def test_rate_limit_answers_429_with_retry_after(limited, seed):
+    app = limited()
+    client = app.test_client()
+    # Un listado cuesta 2 tokens: el segundo ya no entra
+    assert client.get('/planets', buffered=True).status_code == 200
+    response = client.get('/planets', buffered=True)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert app.extensions['admission'].stats()['list']['rate_limited'] == 1
+
+def test_rate_limit_is_off_by_default(make_app):
+    client = make_app(ADMISSION_ENABLED=True).test_client()
+    assert all(client.get('/planets', buffered=True).status_code == 200 for _ in range(50))
+
+def test_requests_that_waited_too_long_get_503(limited):
+    client = limited(rate=0).test_client()
+    started = 't=%.3f' % (time.time() - 5)
+    response = client.get('/planets', headers={'X-Request-Start': started}, buffered=True)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.get('/planets', buffered=True).status_code == 200
+
+def test_slots_are_released(limited):
+    app = limited(rate=0)
+    client = app.test_client()
+    for path in ('/planets', '/planets?stream=1', '/planets/1', '/export'):
+        client.get(path, buffered=True)
+    assert all(counts['in_use'] == 0 for counts in app.extensions['admission'].stats().values())
+
+def test_rejections_reach_the_request_metrics(make_app):
+    from metrics import REQUEST_LATENCY
+    app = make_app(ADMISSION_ENABLED=True, METRICS_ENABLED=True)
+    app.extensions['admission'] = Admission(buckets=TokenBuckets(rate=1, burst=1))
+    client = app.test_client()
+    before = REQUEST_LATENCY.labels('api.get_user', 'GET', '429')._sum.get()
+    client.get('/user/1', buffered=True)
+    client.get('/user/1', buffered=True)
+    assert REQUEST_LATENCY.labels('api.get_user', 'GET', '429')._sum.get() > before
+
+NOW = 1700000002.0
+
+@pytest.mark.parametrize('header, delay', [
+    ('t=1700000000.000', 2),
+    ('1700000000000', 2),
+    ('1700000000000000', 2),
+    ('t=1', 0),
+    ('basura', 0),
+])
+def test_queue_delay_units(header, delay):
+    assert queue_delay({'HTTP_X_REQUEST_START': header}, now=NOW) == pytest.approx(delay)
+
+def test_client_key_uses_trusted_proxies(monkeypatch):
+    environ = {'REMOTE_ADDR': '10.0.0.1', 'HTTP_X_FORWARDED_FOR': '1.1.1.1, 2.2.2.2'}
+    assert client_key(environ) == '10.0.0.1'
+    monkeypatch.setattr('admission.TRUSTED_PROXIES', 1)
+    assert client_key(environ) == '2.2.2.2'
+
+def test_counters_hold_under_threads():
+    # Los workers gthread admiten y liberan desde varios threads a la vez
+    admission = Admission(buckets=TokenBuckets(rate=0))
+    def work():
+        for _ in range(500):
+            if admission.admit('list', {}) is None:
+                admission.release('list')
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = admission.stats()['list']
+    assert stats['in_use'] == 0
+    assert stats['admitted'] + stats['busy'] == 8 * 500
@@ -0,0 +1,52 @@
+import pytest
+from main import create_app
+from models import db
+
+from conftest import CONFIG
+
+
+def rules(app):
+    return {rule.rule for rule in app.url_map.iter_rules()}
+
+
+def test_optional_extensions_off(app):
+    # La configuracion de los tests apaga admin, metrics, migrate y admision
+    assert 'migrate' not in app.extensions
+    assert 'admission' not in app.extensions
+    assert '/metrics' not in rules(app)
+    assert not any(rule.startswith('/admin') for rule in rules(app))
+
+def test_optional_extensions_on(make_app):
+    app = make_app(ADMIN_ENABLED=True, METRICS_ENABLED=True, MIGRATE_ENABLED=True, ADMISSION_ENABLED=True)
+    assert 'migrate' in app.extensions
+    assert 'admission' in app.extensions
+    assert '/metrics' in rules(app)
+    assert '/admin/' in rules(app)
+    assert app.test_client().get('/admin/', buffered=True).status_code == 200
+
+@pytest.mark.parametrize('value, expected', [('false', False), ('0', False), ('true', True)])
+def test_flags_from_env(monkeypatch, db_url, value, expected):
+    for name in ('ADMIN_ENABLED', 'METRICS_ENABLED', 'MIGRATE_ENABLED', 'ADMISSION_ENABLED'):
+        monkeypatch.setenv(name, value)
+    app = create_app({"SQLALCHEMY_DATABASE_URI": db_url})
+    assert app.config['ADMIN_ENABLED'] is expected
+    assert ('migrate' in app.extensions) is expected
+
+def test_config_overrides_env(monkeypatch, db_url):
+    monkeypatch.setenv('MIGRATE_ENABLED', 'true')
+    app = create_app({"SQLALCHEMY_DATABASE_URI": db_url, "MIGRATE_ENABLED": False})
+    assert 'migrate' not in app.extensions
+
+def test_apps_do_not_share_state(seed, client, tmp_path):
+    # Dos apps en el mismo proceso, cada una con su base
+    seed(planets=2)
+    other = create_app(dict(CONFIG, SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'other.db')))
+    with other.app_context():
+        db.create_all(bind_key=None)
+    assert len(client.get('/planets').json) == 2
+    assert other.test_client().get('/planets').json == []
+
+def test_sitemap_lists_endpoints(client):
+    response = client.get('/')
+    assert response.status_code == 200
+    assert '/planets' in response.get_data(as_text=True)
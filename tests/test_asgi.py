@@ -0,0 +1,83 @@
+import pytest
+from starlette.testclient import TestClient
+from asgi import create_asgi_app
+
+from conftest import CONFIG
+
+HEADERS = {'Accept': 'application/json', 'Accept-Encoding': 'gzip'}
+
+
+def link_path(link):
+    return link and link.split('/', 3)[3]
+
+
+@pytest.fixture
+def asgi_client(app, db_url):
+    # La misma base SQLite que la app Flask del test, con aiosqlite
+    with TestClient(create_asgi_app(dict(CONFIG, SQLALCHEMY_DATABASE_URI=db_url))) as client:
+        yield client
+
+
+@pytest.mark.parametrize('path', ['/planets', '/planets?limit=2', '/planets/1', '/favorits/1'])
+def test_same_etag_as_flask(client, asgi_client, seed, path):
+    # Un cliente que pasa de un punto de entrada al otro sigue recibiendo 304
+    seed(users=1, planets=3)
+    client.post('/favorite/planet/1/1')
+    flask_etag = client.get(path, headers=HEADERS).headers['ETag']
+    response = asgi_client.get(path, headers=HEADERS)
+    assert response.headers['ETag'] == flask_etag
+    assert asgi_client.get(path, headers=dict(HEADERS, **{'If-None-Match': flask_etag})).status_code == 304
+
+@pytest.mark.parametrize('path', ['/user', '/planets?limit=2', '/characters?sort=-name&fields=name&limit=2',
+                                  '/favorits', '/user/1', '/characters/2'])
+def test_same_body_and_links_as_flask(client, asgi_client, seed, path):
+    seed(users=2, planets=4, characters=3)
+    client.post('/favorite/planet/1/1')
+    expected = client.get(path)
+    response = asgi_client.get(path)
+    assert response.status_code == 200
+    assert response.json() == expected.json
+    assert response.headers.get('X-Next-Cursor') == expected.headers.get('X-Next-Cursor')
+    # Los dos clientes de prueba usan hosts distintos (testserver, localhost)
+    assert link_path(response.headers.get('Link')) == link_path(expected.headers.get('Link'))
+
+def test_cursor_from_flask_works(client, asgi_client, seed):
+    seed(characters=5)
+    cursor = client.get('/characters?sort=-name&limit=2').headers['X-Next-Cursor']
+    path = '/characters?sort=-name&limit=2&after=%s' % cursor
+    assert asgi_client.get(path).json() == client.get(path).json
+
+def test_missing_entity_is_404(asgi_client, seed):
+    seed(planets=1)
+    response = asgi_client.get('/planets/99')
+    assert response.status_code == 404
+    assert response.json() == {"message": "No existe el planeta"}
+
+def test_writes_go_to_flask(asgi_client, seed):
+    seed(planets=1)
+    etag = asgi_client.get('/planets').headers['ETag']
+    response = asgi_client.post('/planets', json={"name": "Dagobah"})
+    assert response.status_code < 300
+    # La escritura de Flask cambia la version que lee el engine async
+    response = asgi_client.get('/planets', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [row["name"] for row in response.json()] == ['Planeta 1', 'Dagobah']
+
+def test_streams_go_to_flask(asgi_client, seed):
+    seed(planets=3)
+    response = asgi_client.get('/planets?stream=1&limit=1')
+    assert response.headers['Content-Type'].startswith('application/json')
+    assert len(response.json()) == 3
+    assert 'X-Next-Cursor' not in response.headers
+    response = asgi_client.get('/planets', headers={'Accept': 'application/x-ndjson'})
+    assert response.headers['Content-Type'].startswith('application/x-ndjson')
+    assert len(response.text.splitlines()) == 3
+
+def test_large_bodies_are_compressed(asgi_client, seed):
+    seed(planets=200)
+    response = asgi_client.get('/planets?limit=200', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert len(response.json()) == 200
+    small = asgi_client.get('/planets/1', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
@@ -0,0 +1,31 @@
+import pytest
+
+
+def test_bulk_reports_each_row(client, seed):
+    seed(planets=1)
+    body = [{"name": "Naboo"}, {"name": "Naboo"}, {"name": "Planeta 1"}, {}, 3,
+            {"name": ["a"]}, {"name": {"x": 1}}, {"name": "x" * 300}]
+    response = client.post('/planets/bulk', json=body)
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json["results"]] == [
+        "created", "duplicate", "duplicate", "invalid", "invalid", "invalid", "invalid", "invalid"]
+    assert response.json["results"][5]["msg"] == "Valor invalido en name"
+    assert client.get('/planets').json == [{"id": 1, "name": "Planeta 1"}, {"id": 2, "name": "Naboo"}]
+
+def test_bulk_users_check_every_unique_column(client, seed):
+    seed(users=1)
+    user = {"name": "N", "lastname": "A", "username": "nuevo", "email": "nuevo@example.com", "password": "x"}
+    body = [user, dict(user, username="otro"), dict(user, email="usuario1@example.com", username="x"),
+            dict(user, email="otro@example.com", username="otro")]
+    response = client.post('/user/bulk', json=body)
+    assert [result["status"] for result in response.json["results"]] == [
+        "created", "duplicate", "duplicate", "created"]
+
+def test_bulk_requires_a_list(client):
+    assert client.post('/planets/bulk', json={"name": "Naboo"}).status_code == 400
+
+@pytest.mark.parametrize('data', ['[{"name": "Hoth"', '', 'null'])
+def test_malformed_json_is_rejected(client, data):
+    response = client.post('/planets/bulk', data=data, content_type='application/json')
+    assert response.status_code == 400
+    assert response.json["message"] == 'Se esperaba una lista'
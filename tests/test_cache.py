@@ -0,0 +1,19 @@
+from profiler import record_queries
+
+
+def test_cached_entity_does_not_query(client, seed):
+    # La version de la tabla sale de la memoria del proceso (VERSION_TTL)
+    seed(planets=1)
+    client.get('/planets/1')
+    with record_queries() as recorder:
+        response = client.get('/planets/1')
+    assert response.json == {"id": 1, "name": "Planeta 1"}
+    assert recorder.count == 0
+
+def test_own_write_is_seen_right_away(client, seed):
+    seed(planets=1)
+    client.get('/planets/1')
+    client.get('/planets')
+    client.put('/planets/1', json={"name": "Hoth"})
+    assert client.get('/planets/1').json["name"] == "Hoth"
+    assert client.get('/planets').json == [{"id": 1, "name": "Hoth"}]
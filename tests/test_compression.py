@@ -0,0 +1,118 @@
+import gzip
+import json
+import zlib
+import pytest
+import compression
+from compression import CompressionMiddleware, negotiate
+
+
+def decode(data, encoding):
+    if encoding == 'br':
+        return compression.brotli.decompress(data)
+    return gzip.decompress(data)
+
+def call(app, headers=None, method='GET'):
+    # Llama a un WSGI y devuelve (status, headers, partes del cuerpo)
+    environ = {'REQUEST_METHOD': method, 'PATH_INFO': '/'}
+    environ.update({'HTTP_' + name.upper().replace('-', '_'): value for name, value in (headers or {}).items()})
+    started = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        started.update(status=status, headers=dict(response_headers))
+
+    chunks = list(app(environ, start_response))
+    return started['status'], started['headers'], chunks
+
+def wsgi_app(chunks, content_type='application/json', length=True, status='200 OK'):
+    def app(environ, start_response):
+        headers = [('Content-Type', content_type)]
+        if length:
+            headers.append(('Content-Length', str(sum(len(chunk) for chunk in chunks))))
+        start_response(status, headers)
+        return iter(chunks)
+    return app
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip', 'gzip'),
+    ('gzip, br', 'br'),
+    ('br;q=0.5, gzip', 'gzip'),
+    ('identity', None),
+    ('', None),
+])
+def test_negotiate(header, expected):
+    assert negotiate(header) == expected
+
+def test_negotiate_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    assert negotiate('br') is None
+    assert negotiate('br, gzip') == 'gzip'
+
+@pytest.mark.parametrize('encoding', ['gzip', 'br'])
+def test_large_list_is_compressed(client, seed, encoding):
+    seed(planets=100)
+    plain = client.get('/planets?limit=100')
+    response = client.get('/planets?limit=100', headers={'Accept-Encoding': encoding})
+    assert response.headers['Content-Encoding'] == encoding
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert int(response.headers['Content-Length']) == len(response.data) < len(plain.data)
+    assert json.loads(decode(response.data, encoding)) == plain.json
+
+def test_small_body_is_not_compressed(client, seed):
+    seed(planets=1)
+    response = client.get('/planets/1', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    # Los caches igual tienen que distinguir por Accept-Encoding
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.json == {"id": 1, "name": "Planeta 1"}
+
+def test_not_modified_is_not_compressed(client, seed):
+    seed(planets=100)
+    headers = {'Accept-Encoding': 'gzip'}
+    etag = client.get('/planets?limit=100', headers=headers).headers['ETag']
+    response = client.get('/planets?limit=100', headers=dict(headers, **{'If-None-Match': etag}))
+    assert response.status_code == 304
+    assert 'Content-Encoding' not in response.headers
+
+def test_stream_is_compressed_by_parts(client, seed):
+    seed(planets=300)
+    response = client.get('/planets?stream=1', headers={'Accept-Encoding': 'gzip',
+                                                         'Accept': 'application/x-ndjson'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    lines = gzip.decompress(response.data).splitlines()
+    assert len(lines) == 300
+
+def test_each_streamed_part_is_flushed():
+    # Cada parte sale completa: el cliente la puede leer sin esperar al final
+    parts = [b'x' * 2000, b'y' * 10, b'z' * 10]
+    status, headers, chunks = call(CompressionMiddleware(wsgi_app(parts, length=False)),
+                                   {'Accept-Encoding': 'gzip'})
+    decompressor = zlib.decompressobj(31)
+    assert [decompressor.decompress(chunk) for chunk in chunks[:3]] == parts
+
+def test_short_stream_is_not_compressed():
+    status, headers, chunks = call(CompressionMiddleware(wsgi_app([b'{}', b'[]'], length=False)),
+                                   {'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in headers
+    assert b''.join(chunks) == b'{}[]'
+
+@pytest.mark.parametrize('content_type, method, status', [
+    ('image/png', 'GET', '200 OK'),
+    ('application/json', 'HEAD', '200 OK'),
+    ('application/json', 'GET', '204 No Content'),
+])
+def test_skipped_responses(content_type, method, status):
+    body = [b'a' * 5000]
+    app = CompressionMiddleware(wsgi_app(body, content_type=content_type, status=status))
+    _, headers, chunks = call(app, {'Accept-Encoding': 'gzip'}, method=method)
+    assert 'Content-Encoding' not in headers
+    assert chunks == body
+
+def test_existing_vary_is_extended():
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain'), ('Vary', 'Cookie')])
+        return [b'a' * 5000]
+    _, headers, chunks = call(CompressionMiddleware(app), {'Accept-Encoding': 'gzip'})
+    assert headers['Vary'] == 'Cookie, Accept-Encoding'
+    assert gzip.decompress(b''.join(chunks)) == b'a' * 5000
@@ -0,0 +1,59 @@
+import sqlite3
+
+import versions
+from models import db, TableVersion
+
+
+def test_if_none_match_returns_304(client, seed):
+    seed(planets=3)
+    response = client.get('/planets')
+    etag = response.headers['ETag']
+    response = client.get('/planets', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+
+def test_write_changes_the_etag(client, seed):
+    seed(planets=1)
+    etag = client.get('/planets/1').headers['ETag']
+    client.put('/planets/1', json={"name": "Hoth"})
+    response = client.get('/planets/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json["name"] == "Hoth"
+    assert response.headers['ETag'] != etag
+
+def test_write_from_another_process_misses_the_cache(client, seed, db_url, monkeypatch):
+    # Otro worker o un comando escriben sin pasar por la sesion de este
+    # proceso: la version de la tabla cambia y, pasado VERSION_TTL, la cache
+    # no devuelve lo viejo
+    seed(planets=1)
+    first = client.get('/planets/1')
+    client.get('/planets')
+    connection = sqlite3.connect(db_url[len('sqlite:///'):])
+    connection.execute("UPDATE planets SET name = 'Hoth' WHERE id = 1")
+    connection.execute("INSERT INTO table_version (name, version) VALUES ('planets', 1)")
+    connection.commit()
+    connection.close()
+
+    assert client.get('/planets').json == [{"id": 1, "name": "Planeta 1"}]
+    monkeypatch.setattr(versions, 'VERSION_TTL', 0)
+    response = client.get('/planets/1', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 200
+    assert response.json["name"] == "Hoth"
+    assert client.get('/planets').json == [{"id": 1, "name": "Hoth"}]
+
+def test_entity_etag_only_changes_with_its_row(client, seed):
+    # El ETag de una fila sale de sus datos, no de la version de la tabla
+    seed(planets=2)
+    etag = client.get('/planets/1').headers['ETag']
+    client.put('/planets/2', json={"name": "Hoth"})
+    assert client.get('/planets/1', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/planets').headers['ETag'] != client.get('/planets/1').headers['ETag']
+
+def test_version_is_bumped_after_each_commit(app, client, seed):
+    seed(planets=2)
+    client.put('/planets/1', json={"name": "Hoth"})
+    client.put('/planets/2', json={"name": "Endor"})
+    # Una escritura que falla no sube la version
+    client.post('/planets', json={"name": "Hoth"})
+    with app.app_context():
+        assert db.session.get(TableVersion, 'planets').version == 2
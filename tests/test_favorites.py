@@ -0,0 +1,99 @@
+import pytest
+from models import db, Planets, Favorites
+
+
+def counts(app):
+    with app.app_context():
+        return dict(db.session.query(Planets.id, Planets.favorites_count)), db.session.query(Favorites).count()
+
+
+def test_adding_the_same_favorite_twice_inserts_once(app, client, seed):
+    seed(users=1, planets=1)
+    assert client.post('/favorite/planet/1/1').status_code == 200
+    response = client.post('/favorite/planet/1/1')
+    assert response.status_code == 400
+    assert response.json["msg"] == "Planeta existente para ese usuario"
+    assert counts(app) == ({1: 1}, 1)
+
+def test_missing_reference_is_reported(client, seed):
+    seed(users=1)
+    assert client.post('/favorite/planet/1/9').json["msg"] == "No existe el planeta"
+    assert client.post('/favorite/planet/9/1').json["msg"] == "No existe el usuario"
+
+def test_patch_adds_and_removes_in_one_request(app, client, seed):
+    seed(users=1, planets=3)
+    client.patch('/user/1/favorites', json={"add": {"planets": [1, 2]}})
+    response = client.patch('/user/1/favorites', json={"add": {"planets": [3]}, "remove": {"planets": [1]}})
+    assert response.json == {"msg": "Favoritos actualizados", "added": 1, "removed": 1}
+    assert counts(app) == ({1: 0, 2: 1, 3: 1}, 2)
+
+def test_patch_reports_missing_ids(client, seed):
+    seed(users=1, planets=1)
+    response = client.patch('/user/1/favorites', json={"add": {"planets": [1, 5], "characters": [7]}})
+    assert response.status_code == 400
+    assert response.json == {"msg": "Ids inexistentes", "planets": [5], "characters": [7]}
+
+@pytest.mark.parametrize('body', [
+    [1, 2],
+    {"add": [1]},
+    {"add": {"planets": [True]}},
+    {"add": {"planets": "1"}},
+    {"add": {"planets": [1]}, "remove": {"planets": [1]}},
+])
+def test_patch_rejects_malformed_bodies(client, seed, body):
+    seed(users=1, planets=1)
+    assert client.patch('/user/1/favorites', json=body).status_code == 400
+
+@pytest.mark.parametrize('data', ['{"add": {"planets": [1]}', ''])
+def test_patch_rejects_malformed_json(client, seed, data):
+    seed(users=1, planets=1)
+    response = client.patch('/user/1/favorites', data=data, content_type='application/json')
+    assert response.status_code == 400
+
+def test_deleting_a_planet_cascades_and_updates_counts(app, client, seed):
+    seed(users=3, planets=2)
+    for user in (1, 2, 3):
+        client.patch('/user/%d/favorites' % user, json={"add": {"planets": [1, 2]}})
+    assert client.delete('/planets/1').status_code == 200
+    assert counts(app) == ({2: 3}, 3)
+
+def test_deleting_a_user_releases_its_counts(app, client, seed):
+    seed(users=2, planets=1)
+    for user in (1, 2):
+        client.post('/favorite/planet/%d/1' % user)
+    assert client.delete('/user/1').status_code == 200
+    assert counts(app) == ({1: 1}, 1)
+
+def test_reconcile_fixes_drifted_counters(app, client, seed):
+    seed(users=2, planets=2)
+    client.patch('/user/1/favorites', json={"add": {"planets": [1, 2]}})
+    with app.app_context():
+        db.session.execute(db.update(Planets).values(favorites_count=7))
+        db.session.commit()
+    # `flask` abre el contexto de la app antes de correr el comando
+    with app.app_context():
+        result = app.test_cli_runner().invoke(args=['popularity', 'reconcile'])
+    assert result.exit_code == 0
+    assert 'planets: 2 corregidos' in result.output
+    assert counts(app) == ({1: 1, 2: 1}, 2)
+
+def test_top_planets_uses_the_counters(client, seed):
+    seed(users=2, planets=3)
+    client.patch('/user/1/favorites', json={"add": {"planets": [2, 3]}})
+    client.patch('/user/2/favorites', json={"add": {"planets": [3]}})
+    response = client.get('/planets/top?n=2')
+    assert [(row["id"], row["favorites"]) for row in response.json] == [(3, 2), (2, 1)]
+
+@pytest.mark.parametrize('body', [
+    {"id_user": [1], "id_planets": 1},
+    {"id_user": 1, "id_planets": "1"},
+    {"id_user": 1, "id_characters": True},
+    [1, 1],
+])
+def test_add_favorite_rejects_ids_that_are_not_ints(client, seed, body):
+    seed(users=1, planets=1)
+    assert client.post('/favorite', json=body).status_code == 400
+
+def test_add_favorite_rejects_malformed_json(client):
+    response = client.post('/favorite', data='{"id_user":', content_type='application/json')
+    assert response.status_code == 400
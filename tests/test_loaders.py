@@ -0,0 +1,50 @@
+import loaders
+from loaders import loader
+from models import Planets, Characters
+from profiler import record_queries
+
+
+def test_exists_and_missing(app, seed):
+    seed(planets=3)
+    with app.test_request_context():
+        assert loader(Planets).exists(2)
+        assert not loader(Planets).exists(9)
+        assert loader(Planets).missing([1, 3, 7, 8, None]) == {7, 8}
+        assert loader(Planets).load([]) == {}
+
+def test_known_ids_do_not_query_again(app, seed):
+    seed(planets=3, characters=1)
+    with app.test_request_context():
+        with record_queries() as recorder:
+            loader(Planets).missing([1, 2, 5])
+            loader(Planets).exists(1)
+            loader(Planets).exists(5)
+        assert recorder.count == 1
+        # Otra tabla, otro cargador
+        with record_queries() as recorder:
+            loader(Characters).exists(1)
+            loader(Planets).exists(3)
+        assert recorder.count == 2
+
+def test_ids_are_batched(app, seed, monkeypatch):
+    monkeypatch.setattr(loaders, 'IN_CHUNK', 2)
+    seed(planets=4)
+    with app.test_request_context():
+        with record_queries() as recorder:
+            assert loader(Planets).missing(range(1, 7)) == {5, 6}
+        assert recorder.count == 3
+
+def test_one_loader_per_request(app, seed):
+    seed(planets=1)
+    with app.test_request_context():
+        assert loader(Planets) is loader(Planets)
+    with app.test_request_context():
+        with record_queries() as recorder:
+            loader(Planets).exists(1)
+        assert recorder.count == 1
+
+def test_outside_a_request_each_loader_is_new(app, seed):
+    seed(planets=1)
+    with app.app_context():
+        assert loader(Planets) is not loader(Planets)
+        assert loader(Planets).exists(1)
@@ -0,0 +1,29 @@
+import json
+import logging
+
+from logs import JSONFormatter, debug_event, truncate_value
+
+
+def record(msg, **fields):
+    entry = logging.LogRecord('api', logging.INFO, __file__, 1, msg, None, None)
+    entry.fields = fields
+    return entry
+
+def test_long_values_keep_the_line_valid_json():
+    # Se recorta cada valor: la linea sigue siendo JSON aunque sea larga
+    line = JSONFormatter().format(record('x' * 5000, sql='y' * 5000, params=list(range(2000))))
+    entry = json.loads(line)
+    assert entry['msg'].startswith('x' * 2000) and entry['msg'].endswith('[3000 caracteres mas]')
+    assert len(entry['sql']) < 2100
+    assert isinstance(entry['params'], str)
+
+def test_short_values_are_kept():
+    assert truncate_value([1, 2], limit=10) == [1, 2]
+    assert truncate_value(None) is None
+    assert truncate_value(12345678901234, limit=3) == 12345678901234
+
+def test_debug_event_is_skipped_when_disabled(caplog):
+    logger = logging.getLogger('tests.logs')
+    with caplog.at_level(logging.INFO, logger='tests.logs'):
+        debug_event(logger, 'oculto', costly=1)
+    assert caplog.records == []
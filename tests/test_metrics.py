@@ -0,0 +1,55 @@
+import pytest
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+
+
+@pytest.fixture
+def metrics_client(make_app, monkeypatch):
+    # El registro por defecto es del proceso: los tests miran diferencias
+    monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR', raising=False)
+    return make_app(METRICS_ENABLED=True).test_client()
+
+def requests_count(endpoint, status):
+    value = REGISTRY.get_sample_value('http_request_duration_seconds_count',
+                                      {"endpoint": endpoint, "method": "GET", "status": status})
+    return value or 0
+
+def scrape(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain')
+    return {sample.name: sample for family in text_string_to_metric_families(response.get_data(as_text=True))
+            for sample in family.samples}
+
+
+def test_request_latency_by_endpoint_and_status(metrics_client, seed):
+    seed(planets=2)
+    before_ok = requests_count('api.all_planets', '200')
+    before_missing = requests_count('not_found', '404')
+    metrics_client.get('/planets')
+    metrics_client.get('/planets')
+    metrics_client.get('/no-existe')
+    assert requests_count('api.all_planets', '200') == before_ok + 2
+    assert requests_count('not_found', '404') == before_missing + 1
+
+def test_in_flight_returns_to_zero(metrics_client):
+    metrics_client.get('/planets')
+    assert REGISTRY.get_sample_value('http_requests_in_flight', {"endpoint": "api.all_planets"}) == 0
+
+def test_pool_and_cache_gauges(metrics_client):
+    metrics_client.get('/planets')
+    samples = scrape(metrics_client)
+    for name in ('db_pool_checked_out', 'db_pool_overflow', 'db_pool_timeouts', 'cache_operations',
+                 'db_pool_checkout_wait_seconds_count'):
+        assert name in samples
+
+def test_admission_gauges_only_when_enabled(make_app, monkeypatch):
+    monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR', raising=False)
+    client = make_app(METRICS_ENABLED=True, ADMISSION_ENABLED=True).test_client()
+    client.get('/planets', buffered=True)
+    samples = scrape(client)
+    assert 'admission_requests' in samples
+    assert 'admission_in_use' in samples
+
+def test_metrics_route_absent_when_disabled(client):
+    assert client.get('/metrics').status_code == 404
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+from flask_migrate import check, downgrade, stamp, upgrade
+from models import db
+
+# La primera migracion es solo de MySQL: se parte del esquema de los modelos
+# (el de head) y se marca la revision desde la que se quiere migrar
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+@pytest.fixture
+def migrated(make_app):
+    return make_app(MIGRATE_ENABLED=True)
+
+def run(app, *statements):
+    with app.app_context():
+        for statement in statements:
+            db.session.execute(db.text(statement))
+        db.session.commit()
+
+def rows(app, statement):
+    with app.app_context():
+        return [tuple(row) for row in db.session.execute(db.text(statement))]
+
+
+def test_unique_favorites_keeps_the_other_column_of_a_duplicate(migrated, seed):
+    seed(users=1, planets=2, characters=2)
+    run(migrated,
+        "DROP INDEX ix_favorites_user_planets",
+        "DROP INDEX ix_favorites_user_characters",
+        "INSERT INTO favorites (id, id_user, id_planets, id_characters) VALUES "
+        "(1, 1, 1, 1), (2, 1, 1, 2), (3, 1, 2, 1), (4, 1, 2, NULL)")
+    with migrated.app_context():
+        stamp(directory=MIGRATIONS, revision='7f29c6fcd964')
+        upgrade(directory=MIGRATIONS, revision='a3c5e81b2d47')
+    # El 2 pierde solo el planeta repetido, el 3 solo el personaje y el 4 no
+    # tiene nada que no este en otra fila
+    assert rows(migrated, "SELECT id, id_planets, id_characters FROM favorites ORDER BY id") == \
+        [(1, 1, 1), (2, None, 2), (3, 2, None)]
+
+@pytest.mark.filterwarnings('ignore:Skipped unsupported reflection of expression-based index')
+def test_models_match_the_migrations(migrated):
+    # Las tablas FTS5 y los indices por expresion los crea SQL propio: el
+    # autogenerate no los tiene que proponer como borrados
+    with migrated.app_context():
+        stamp(directory=MIGRATIONS, revision='head')
+        check(directory=MIGRATIONS)
+
+@pytest.mark.filterwarnings('ignore:Skipped unsupported reflection of expression-based index')
+def test_downgrade_and_upgrade_keep_search_and_favorites(migrated, seed, client):
+    seed(users=1, planets=1, characters=1)
+    client.post('/favorite', json={"id_user": 1, "id_planets": 1, "id_characters": 1})
+    with migrated.app_context():
+        stamp(directory=MIGRATIONS, revision='head')
+        downgrade(directory=MIGRATIONS, revision='a3c5e81b2d47')
+        upgrade(directory=MIGRATIONS, revision='head')
+        check(directory=MIGRATIONS)
+    assert rows(migrated, "SELECT id_user, id_planets, id_characters FROM favorites") == [(1, 1, 1)]
+    assert rows(migrated, "SELECT id, favorites_count FROM planets") == [(1, 1)]
+    assert [row["name"] for row in client.get('/search?q=lan').json] == ['Planeta 1']
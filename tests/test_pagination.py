@@ -0,0 +1,36 @@
+def walk(client, path):
+    # Sigue X-Next-Cursor hasta el final; devuelve las paginas
+    pages = []
+    while path is not None:
+        response = client.get(path)
+        assert response.status_code == 200
+        pages.append(response.json)
+        cursor = response.headers.get('X-Next-Cursor')
+        path = None
+        if cursor is not None:
+            assert 'after=%s' % cursor in response.headers['Link']
+            path = response.headers['Link'].split(';')[0].strip('<>')
+    return pages
+
+
+def test_cursor_walks_every_row_once(client, seed):
+    seed(planets=25)
+    pages = walk(client, '/planets?limit=10')
+    assert [len(page) for page in pages] == [10, 10, 5]
+    ids = [row["id"] for page in pages for row in page]
+    assert ids == list(range(1, 26))
+
+def test_cursor_keeps_sort_and_filters(client, seed):
+    seed(characters=12)
+    pages = walk(client, '/characters?limit=2&sort=-name&name=Nombre 1&name=Nombre 10&name=Nombre 11'
+                         '&fields=name')
+    names = [row["name"] for page in pages for row in page]
+    assert names == ['Nombre 11', 'Nombre 10', 'Nombre 1']
+    assert all(set(row) == {"name"} for page in pages for row in page)
+
+def test_limit_is_capped_and_validated(client, seed):
+    seed(planets=3)
+    assert client.get('/planets?limit=0').status_code == 400
+    assert client.get('/planets?limit=x').status_code == 400
+    assert client.get('/planets?after=nope').status_code == 400
+    assert client.get('/planets?sort=password').status_code == 400
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+import pool
+from models import db
+
+
+def test_engine_options_from_env(monkeypatch, db_url):
+    monkeypatch.setenv('DB_POOL_SIZE', '3')
+    monkeypatch.setenv('DB_MAX_OVERFLOW', '0')
+    monkeypatch.setenv('DB_POOL_TIMEOUT', '2.5')
+    monkeypatch.setenv('DB_POOL_PRE_PING', 'false')
+    options = pool.engine_options(db_url)
+    assert options['poolclass'] is pool.TimedQueuePool
+    assert (options['pool_size'], options['max_overflow'], options['pool_timeout']) == (3, 0, 2.5)
+    assert options['pool_pre_ping'] is False
+    assert 'connect_args' not in options
+
+def test_engine_options_keep_memory_sqlite_pool():
+    # SQLite en memoria es una sola conexion: no se le pone QueuePool
+    assert pool.engine_options('sqlite://') == {}
+    assert pool.engine_options('') == {}
+
+def test_pool_timeout_is_counted(db_url, monkeypatch):
+    monkeypatch.setattr(pool, 'checkout_wait', pool.WaitHistogram())
+    engine = create_engine(db_url, poolclass=pool.TimedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05)
+    held = engine.connect()
+    try:
+        stats = pool.pool_stats(engine)
+        assert (stats['pool'], stats['checked_out'], stats['size']) == ('TimedQueuePool', 1, 1)
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+    finally:
+        held.close()
+        engine.dispose()
+    snapshot = pool.pool_stats(engine)['checkout_wait']
+    assert snapshot['timeouts'] == 1
+    # El checkout que vencio tambien cuenta como espera, con al menos pool_timeout
+    assert snapshot['count'] == 2
+    assert snapshot['sum'] >= 0.05
+    assert snapshot['buckets']['+Inf'] == 2
+
+def test_sqlite_connections_enforce_foreign_keys(app):
+    with app.app_context():
+        assert db.session.execute(text('PRAGMA foreign_keys')).scalar() == 1
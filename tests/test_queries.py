@@ -0,0 +1,37 @@
+import pytest
+from profiler import assert_max_queries
+
+
+def add_favorites(client, user_id, planets=(), characters=()):
+    response = client.patch('/user/%d/favorites' % user_id,
+                            json={"add": {"planets": list(planets), "characters": list(characters)}})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('favorites', [1, 20])
+def test_user_favorites_query_count_does_not_grow(client, seed, favorites):
+    # Version de las tablas (ETag), el usuario y sus favoritos con planeta y
+    # personaje: 3 consultas, tenga los favoritos que tenga
+    seed(users=1, planets=favorites, characters=favorites)
+    add_favorites(client, 1, planets=range(1, favorites + 1), characters=range(1, favorites + 1))
+    with assert_max_queries(3):
+        response = client.get('/user/1/favorites')
+    assert response.status_code == 200
+    assert len(response.json) == favorites * 2
+    assert all(item["planet"] or item["character"] for item in response.json)
+
+@pytest.mark.parametrize('path', ['/user', '/planets', '/characters', '/favorits'])
+def test_list_endpoints_query_count(client, seed, path):
+    # La version de la tabla y una consulta para la pagina
+    seed(users=30, planets=30, characters=30)
+    add_favorites(client, 1, planets=range(1, 31))
+    with assert_max_queries(2):
+        response = client.get(path + '?limit=10')
+    assert response.status_code == 200
+    assert len(response.json) == 10
+
+def test_assert_max_queries_reports_the_queries(client, seed):
+    seed(planets=1)
+    with pytest.raises(AssertionError, match='como maximo 0 consultas'):
+        with assert_max_queries(0):
+            client.get('/planets')
@@ -0,0 +1,16 @@
+import shutil
+
+
+def test_writer_reads_its_own_write_with_a_lagging_replica(make_app, db_url, tmp_path):
+    replica = 'sqlite:///%s' % (tmp_path / 'replica.db')
+    app = make_app(DB_REPLICAS=[replica], SQLALCHEMY_BINDS={'replica_0': {'url': replica}})
+    writer, reader = app.test_client(), app.test_client()
+    writer.post('/planets', json={"name": "Tatooine"})
+    # Replica congelada: nunca recibe lo que se escribe despues
+    shutil.copy(db_url[len('sqlite:///'):], replica[len('sqlite:///'):])
+
+    assert reader.get('/planets/1').json["name"] == "Tatooine"
+    writer.put('/planets/1', json={"name": "Hoth"})
+    assert reader.get('/planets/1').json["name"] == "Tatooine"
+    assert writer.get('/planets/1').json["name"] == "Hoth"
+    assert writer.get('/planets').json == [{"id": 1, "name": "Hoth"}]
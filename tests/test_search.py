@@ -0,0 +1,53 @@
+import pytest
+from models import db, Planets, Characters
+
+
+def names(response):
+    return [item['name'] for item in response.get_json()]
+
+def test_prefix_before_substring(app, client):
+    with app.app_context():
+        db.session.add_all([Planets(name='Tatooine'), Planets(name='Ahch-To'),
+                            Characters(name='Luke', lastName='Skywalker'),
+                            Characters(name='Tarfful', lastName='Wookiee')])
+        db.session.commit()
+    # Los prefijos por nombre (la coincidencia exacta primero), despues las subcadenas
+    assert names(client.get('/search?q=ta')) == ['Tarfful', 'Tatooine']
+    assert names(client.get('/search?q=sky')) == ['Luke']
+    assert names(client.get('/search?q=ook')) == ['Tarfful']
+    assert names(client.get('/search?q=too')) == ['Tatooine']
+
+def test_search_pages_with_cursor(app, client):
+    with app.app_context():
+        db.session.add_all([Planets(name='Planeta %02d' % i) for i in range(5)])
+        db.session.commit()
+    first = client.get('/search?q=planeta&limit=3')
+    assert names(first) == ['Planeta 00', 'Planeta 01', 'Planeta 02']
+    rest = client.get(first.headers['Link'].split(';')[0].strip('<>'))
+    assert names(rest) == ['Planeta 03', 'Planeta 04']
+    assert 'Link' not in rest.headers
+
+def test_search_validates_q(client):
+    assert client.get('/search').status_code == 400
+    assert client.get('/search?q=' + 'x' * 101).status_code == 400
+
+@pytest.mark.parametrize('q', ['\U0010ffff', 'ta\U0010ffff\U0010ffff'])
+def test_prefix_of_the_last_code_point(client, seed, q):
+    seed(planets=1)
+    response = client.get('/search', query_string={'q': q})
+    assert response.status_code == 200
+    assert response.json == []
+
+def test_favorite_counters_do_not_reindex_names(app, client, seed):
+    # El trigger de UPDATE de la tabla FTS5 solo mira las columnas buscadas
+    seed(users=3, planets=1)
+    def segments():
+        with app.app_context():
+            return db.session.execute(db.text('SELECT count(*) FROM planets_fts_data')).scalar()
+    before = segments()
+    for user in (1, 2, 3):
+        client.post('/favorite/planet/%d/1' % user)
+    assert segments() == before
+    client.put('/planets/1', json={"name": "Hoth"})
+    assert segments() > before
+    assert names(client.get('/search?q=hot')) == ['Hoth']
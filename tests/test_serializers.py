@@ -0,0 +1,51 @@
+import json
+import pytest
+import serializers
+from models import db, User, Characters
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def encoder(request, monkeypatch):
+    # Los mismos tests con orjson y con el json de la libreria estandar
+    if request.param == 'json':
+        monkeypatch.setattr(serializers, 'orjson', None)
+    elif serializers.orjson is None:
+        pytest.skip('orjson no esta instalado')
+    return request.param
+
+
+def test_project_matches_serialize(app, seed):
+    # Las tuplas de project() dan los mismos diccionarios que serialize()
+    seed(users=2, characters=3)
+    with app.app_context():
+        for model in (User, Characters):
+            rows = serializers.to_dicts(model.serialize_columns, serializers.project(model).order_by(model.id))
+            assert rows == [entity.serialize() for entity in db.session.query(model).order_by(model.id)]
+
+def test_project_leaves_out_password(app, seed):
+    seed(users=1)
+    with app.app_context():
+        assert 'password' not in User.serialize_columns
+        assert len(serializers.project(User).one()) == len(User.serialize_columns)
+
+def test_project_selected_columns(app, seed):
+    seed(characters=2)
+    with app.app_context():
+        assert serializers.project(Characters, ['name']).order_by(Characters.id).all() == \
+            [('Nombre 1',), ('Nombre 2',)]
+
+def test_dumps_is_compact_json(encoder):
+    obj = {"id": 1, "name": "Ñandú", "tags": [None, True, 1.5]}
+    data = serializers.dumps(obj)
+    assert isinstance(data, bytes)
+    assert b' ' not in data.replace('Ñandú'.encode(), b'')
+    assert json.loads(data) == obj
+    assert serializers.loads(data) == obj
+    assert serializers.loads(data.decode()) == obj
+
+def test_json_response(app, encoder):
+    with app.app_context():
+        response = serializers.json_response([{"id": 1}], status=201)
+    assert response.status_code == 201
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.get_data()) == [{"id": 1}]
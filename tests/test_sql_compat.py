@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import column
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sql_compat import async_url, contains, is_memory_sqlite, timeout_connect_args, connect_statements
+
+
+@pytest.mark.parametrize('uri, expected', [
+    ('sqlite://', True),
+    ('sqlite:///:memory:', True),
+    ('sqlite+aiosqlite://', True),
+    ('sqlite:////tmp/app.db', False),
+    ('mysql+mysqlconnector://u:p@h/db', False),
+])
+def test_is_memory_sqlite(uri, expected):
+    assert is_memory_sqlite(uri) is expected
+
+def test_async_url_swaps_the_driver():
+    assert async_url('mysql+mysqlconnector://u:p@h/db') == 'mysql+aiomysql://u:p@h/db'
+    assert async_url('postgresql://u:p@h/db') == 'postgresql+asyncpg://u:p@h/db'
+    assert async_url('sqlite:////tmp/app.db') == 'sqlite+aiosqlite:////tmp/app.db'
+
+@pytest.mark.parametrize('uri, expected', [
+    ('postgresql://u@h/db', {'options': '-c statement_timeout=500'}),
+    ('postgresql+asyncpg://u@h/db', {'server_settings': {'statement_timeout': '500'}}),
+    ('mysql+aiomysql://u@h/db', {'init_command': 'SET SESSION max_execution_time = 500'}),
+    ('mysql+mysqlconnector://u@h/db', {}),
+    ('sqlite:////tmp/app.db', {}),
+])
+def test_timeout_connect_args(uri, expected):
+    assert timeout_connect_args(uri, 500) == expected
+    assert timeout_connect_args(uri, 0) == {}
+
+def test_connect_statements():
+    # MySQL sync recibe el timeout por conexion; SQLite siempre activa las FK
+    assert connect_statements('mysql', 500) == ['SET SESSION max_execution_time = 500']
+    assert connect_statements('mysql', 0) == []
+    assert connect_statements('sqlite', 0) == ['PRAGMA foreign_keys = ON']
+    assert connect_statements('postgresql', 500) == []
+
+@pytest.mark.parametrize('name, dialect, expected', [
+    ('mysql', mysql.dialect(), 'MATCH (name) AGAINST'),
+    ('postgresql', postgresql.dialect(), 'lower(name) LIKE'),
+    ('sqlite', sqlite.dialect(), 'lower(name) LIKE'),
+])
+def test_contains_per_dialect(name, dialect, expected):
+    assert expected in str(contains([column('name')], '50%', name).compile(dialect=dialect))
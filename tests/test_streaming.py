@@ -0,0 +1,12 @@
+import json
+
+
+def test_stream_returns_the_whole_table(client, seed):
+    seed(planets=7)
+    response = client.get('/planets?stream=1')
+    assert response.is_streamed
+    assert [row["id"] for row in json.loads(response.get_data())] == list(range(1, 8))
+
+    response = client.get('/planets', headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    assert len(response.get_data().splitlines()) == 7
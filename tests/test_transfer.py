@@ -0,0 +1,101 @@
+import pytest
+import transfer
+from main import create_app
+from models import db
+
+from conftest import CONFIG
+
+TOKEN = {'Authorization': 'Bearer secreto'}
+LISTS = ['/user', '/planets', '/characters', '/favorits', '/planets/top', '/characters/top']
+
+
+@pytest.fixture
+def exporting(client, monkeypatch):
+    monkeypatch.setattr(transfer, 'EXPORT_TOKEN', 'secreto')
+    return client
+
+@pytest.fixture
+def populated(client, seed):
+    seed(users=3, planets=5, characters=4)
+    for user_id, planet_id in ((1, 1), (2, 1), (3, 2)):
+        assert client.post('/favorite/planet/%d/%d' % (user_id, planet_id)).status_code < 300
+    assert client.post('/favorite/character/1/3').status_code < 300
+
+@pytest.fixture
+def target(tmp_path):
+    # Otra app, con su propia base vacia, donde se importa
+    app = create_app(dict(CONFIG, SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'target.db')))
+    with app.app_context():
+        db.create_all(bind_key=None)
+    return app
+
+def run(app, *args):
+    # `flask` empuja el contexto de la app antes del comando; app.cli no
+    with app.app_context():
+        return app.test_cli_runner().invoke(args=list(args))
+
+def listing(client):
+    return {path: client.get(path + ('?limit=100' if not path.endswith('top') else '')).json for path in LISTS}
+
+
+def test_export_needs_the_token(client, exporting):
+    assert exporting.get('/export').status_code == 401
+    assert exporting.get('/export', headers={'Authorization': 'Bearer otro'}).status_code == 401
+    assert exporting.get('/export', headers=TOKEN).status_code == 200
+
+def test_export_disabled_without_token(client):
+    assert client.get('/export', headers=TOKEN).status_code == 404
+
+@pytest.mark.parametrize('query', ['format=xml', 'tables=planets,naves'])
+def test_export_rejects_bad_arguments(exporting, query):
+    assert exporting.get('/export?' + query, headers=TOKEN).status_code == 400
+
+def test_export_selected_tables(exporting, populated):
+    response = exporting.get('/export?tables=planets', headers=TOKEN)
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 5
+    assert all(line.startswith('{"table":"planets"') for line in lines)
+    assert 'favorites_count' not in lines[0]
+    assert response.headers['Cache-Control'] == 'no-store'
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'csv'])
+@pytest.mark.parametrize('defer_indexes', [False, True])
+def test_round_trip(exporting, populated, target, tmp_path, fmt, defer_indexes):
+    response = exporting.get('/export?format=%s' % fmt, headers=TOKEN)
+    assert response.status_code == 200
+    path = tmp_path / ('export.' + fmt)
+    path.write_bytes(response.data)
+
+    args = ['data', 'import', str(path), '--batch', '2'] + (['--defer-indexes'] if defer_indexes else [])
+    result = run(target, *args)
+    assert result.exit_code == 0, result.output
+    assert 'user: 3, planets: 5, characters: 4, favorites: 4' in result.output
+
+    imported = target.test_client()
+    # Mismas filas, contadores de favoritos recalculados y busqueda reindexada
+    assert listing(imported) == listing(exporting)
+    assert [item["name"] for item in imported.get('/search?q=planeta 2').json] == ['Planeta 2']
+    # Los ids nuevos siguen despues de los importados
+    assert imported.post('/planets', json={"name": "Dagobah"}).status_code < 300
+    assert imported.get('/planets?limit=100').json[-1] == {"id": 6, "name": "Dagobah"}
+
+def test_export_command_matches_endpoint(exporting, populated, app, tmp_path):
+    path = tmp_path / 'export.csv'
+    result = run(app, 'data', 'export', str(path))
+    assert result.exit_code == 0, result.output
+    assert path.read_bytes() == exporting.get('/export?format=csv', headers=TOKEN).data
+
+def test_import_reports_repeated_rows(exporting, populated, target, tmp_path):
+    path = tmp_path / 'export.ndjson'
+    path.write_bytes(exporting.get('/export?tables=planets', headers=TOKEN).data)
+    assert run(target, 'data', 'import', str(path)).exit_code == 0
+    result = run(target, 'data', 'import', str(path))
+    assert result.exit_code != 0
+    assert 'planets: fila repetida' in result.output
+
+def test_import_rejects_bad_lines(target, tmp_path):
+    path = tmp_path / 'export.ndjson'
+    path.write_text('{"table":"planets","row":{"id":1,"name":"Hoth"}}\nno es json\n')
+    result = run(target, 'data', 'import', str(path))
+    assert result.exit_code != 0
+    assert 'Linea 2 invalida' in result.output